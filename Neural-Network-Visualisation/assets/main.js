@@ -743,13 +743,28 @@ function decodeFloat16Base64(base64, expectedLength) {
   return result;
 }
 
-function decodeWeightMatrix(encoded, shape) {
-  const rows = Math.max(0, Number(shape?.[0]) || 0);
-  const cols = Math.max(0, Number(shape?.[1]) || 0);
-  if (rows === 0 || cols === 0) {
-    return [];
+let float16LookupTable = null;
+
+function float16ArrayToFloat32(buffer, byteOffset, length) {
+  // Converts layer_blob_v1 float16 data to Float32Array, natively via Float16Array when available, otherwise via a lookup table.
+  if (typeof Float16Array === "function") {
+    return new Float32Array(new Float16Array(buffer, byteOffset, length));
+  }
+  if (!float16LookupTable) {
+    float16LookupTable = new Float32Array(0x10000);
+    for (let half = 0; half < 0x10000; half += 1) {
+      float16LookupTable[half] = float16ToFloat32(half);
+    }
   }
-  const flat = decodeFloat16Base64(encoded, rows * cols);
+  const halves = new Uint16Array(buffer, byteOffset, length);
+  const result = new Float32Array(length);
+  for (let index = 0; index < length; index += 1) {
+    result[index] = float16LookupTable[halves[index]];
+  }
+  return result;
+}
+
+function splitMatrixRows(flat, rows, cols) {
   const result = [];
   for (let row = 0; row < rows; row += 1) {
     const start = row * cols;
@@ -759,6 +774,15 @@ function decodeWeightMatrix(encoded, shape) {
   return result;
 }
 
+function decodeWeightMatrix(encoded, shape) {
+  const rows = Math.max(0, Number(shape?.[0]) || 0);
+  const cols = Math.max(0, Number(shape?.[1]) || 0);
+  if (rows === 0 || cols === 0) {
+    return [];
+  }
+  return splitMatrixRows(decodeFloat16Base64(encoded, rows * cols), rows, cols);
+}
+
 function normaliseShape(shape, fallback = []) {
   const source = Array.isArray(shape) ? shape : fallback;
   if (!Array.isArray(source)) return [];
@@ -792,18 +816,150 @@ function normaliseWeightsDescriptor(descriptor, baseUrl) {
     url,
     dtype: typeof descriptor.dtype === "string" ? descriptor.dtype : "float16",
     format: typeof descriptor.format === "string" ? descriptor.format : "layer_array_v1",
+    base: typeof descriptor.base === "string" ? descriptor.base : null,
+    layers: Array.isArray(descriptor.layers) ? descriptor.layers : null,
+    range:
+      Number.isFinite(descriptor.offset) && Number.isFinite(descriptor.length)
+        ? { offset: Number(descriptor.offset), length: Number(descriptor.length) }
+        : null,
   };
 }
 
-async function fetchSnapshotPayload(url) {
+const timelineContainers = new Map();
+
+async function fetchContainerRange(url, offset, length) {
+  if (length === 0) {
+    return new ArrayBuffer(0);
+  }
+  const response = await fetch(url, {
+    headers: { Range: `bytes=${offset}-${offset + length - 1}` },
+  });
+  if (!response.ok) {
+    throw new Error(`无法加载快照 (${response.status})`);
+  }
+  const buffer = await response.arrayBuffer();
+  // Servers without Range support return the whole file, so slice out the requested part.
+  return response.status === 206 ? buffer : buffer.slice(offset, offset + length);
+}
+
+async function fetchContainerSlice(url, range) {
+  // The first snapshot of a timeline container is fetched with a Range request while the whole
+  // file downloads in the background (browser-cached); later scrubbing slices it from memory.
+  // If the background download fails, every snapshot falls back to its own Range request.
+  const { offset, length } = range;
+  const container = timelineContainers.get(url);
+  if (container) {
+    const buffer = await container.catch(() => null);
+    if (buffer) {
+      return buffer.slice(offset, offset + length);
+    }
+    return fetchContainerRange(url, offset, length);
+  }
+  const download = fetch(url).then((response) => {
+    if (!response.ok) {
+      throw new Error(`无法加载时间线文件 (${response.status})`);
+    }
+    return response.arrayBuffer();
+  });
+  download.catch((error) => console.warn("时间线文件下载失败，改为按快照请求:", error));
+  timelineContainers.set(url, download);
+  return fetchContainerRange(url, offset, length);
+}
+
+async function fetchSnapshotPayload(url, format = "layer_array_v1", range = null) {
+  if (range) {
+    return fetchContainerSlice(url, range);
+  }
   const response = await fetch(url, { cache: "no-store" });
   if (!response.ok) {
     throw new Error(`无法加载快照 (${response.status})`);
   }
-  return response.json();
+  return format === "layer_array_v1" ? response.json() : response.arrayBuffer();
 }
 
-function decodeSnapshotLayers(payload, layerMetadata) {
+function decodeSnapshotBlob(buffer, layerMetadata) {
+  // Each layer's row-major weights then biases, little-endian float16, no header; offsets follow from the layer shapes.
+  let offset = 0;
+  const layers = layerMetadata.map((meta) => {
+    const [rows, cols] = meta.weightShape;
+    const biasLength = meta.biasShape[0] ?? 0;
+    const weightBytes = rows * cols * 2;
+    if (offset + weightBytes + biasLength * 2 > buffer.byteLength) {
+      throw new Error(`快照文件缺少第 ${meta.layerIndex} 层数据。`);
+    }
+    const weights = splitMatrixRows(float16ArrayToFloat32(buffer, offset, rows * cols), rows, cols);
+    offset += weightBytes;
+    const biases = float16ArrayToFloat32(buffer, offset, biasLength);
+    offset += biasLength * 2;
+    return {
+      name: meta.name,
+      activation: meta.activation,
+      weights,
+      biases,
+    };
+  });
+  if (offset !== buffer.byteLength) {
+    throw new Error(`快照文件长度无效：期望 ${offset} 字节，实际为 ${buffer.byteLength} 字节。`);
+  }
+  return layers;
+}
+
+function applyDeltaSection(previous, buffer, section) {
+  // layer_delta_v1: int8 deltas times the array's scale are added to the previous snapshot;
+  // "sparse" is a bitmask followed by the changed values' deltas, "zero" means unchanged.
+  const encoding = section?.encoding;
+  if (encoding === "zero") {
+    return previous;
+  }
+  const scale = Number(section.scale);
+  const offset = Number(section.offset);
+  const length = previous.length;
+  const result = new Float32Array(previous);
+  if (encoding === "dense") {
+    const values = new Int8Array(buffer, offset, length);
+    for (let index = 0; index < length; index += 1) {
+      result[index] = previous[index] + values[index] * scale;
+    }
+  } else if (encoding === "sparse") {
+    const maskLength = Math.ceil(length / 8);
+    const mask = new Uint8Array(buffer, offset, maskLength);
+    const values = new Int8Array(buffer, offset + maskLength, Number(section.count));
+    let valueIndex = 0;
+    for (let index = 0; index < length; index += 1) {
+      if (mask[index >> 3] & (1 << (index & 7))) {
+        result[index] = previous[index] + values[valueIndex] * scale;
+        valueIndex += 1;
+      }
+    }
+  } else {
+    throw new Error(`未知的增量编码：${encoding}`);
+  }
+  return result;
+}
+
+function applySnapshotDelta(baseLayers, buffer, sections, layerMetadata) {
+  if (!Array.isArray(sections) || sections.length !== layerMetadata.length) {
+    throw new Error("增量快照的层描述无效。");
+  }
+  return layerMetadata.map((meta, index) => {
+    const [rows, cols] = meta.weightShape;
+    const baseLayer = baseLayers[index];
+    const flatWeights = new Float32Array(rows * cols);
+    baseLayer.weights.forEach((row, rowIndex) => flatWeights.set(row, rowIndex * cols));
+    const weights = applyDeltaSection(flatWeights, buffer, sections[index].weights);
+    return {
+      name: baseLayer.name,
+      activation: baseLayer.activation,
+      weights: splitMatrixRows(weights, rows, cols),
+      biases: applyDeltaSection(baseLayer.biases, buffer, sections[index].biases),
+    };
+  });
+}
+
+function decodeSnapshotLayers(payload, layerMetadata, format = "layer_array_v1") {
+  if (format === "layer_blob_v1") {
+    return decodeSnapshotBlob(payload, layerMetadata);
+  }
   if (!payload || typeof payload !== "object" || !Array.isArray(payload.layers)) {
     throw new Error("快照文件不包含有效图层数据。");
   }
@@ -852,8 +1008,9 @@ function hydrateTimeline(rawTimeline, options = {}) {
   );
 
   const baseUrl = options.baseUrl ?? window.location.href;
+  const snapshotsById = new Map();
 
-  return rawTimeline
+  const snapshots = rawTimeline
     .map((entry, index) => {
       if (!entry || typeof entry !== "object") return null;
 
@@ -878,18 +1035,41 @@ function hydrateTimeline(rawTimeline, options = {}) {
         },
         weights,
         layers: null,
+        pendingLayers: null,
         async loadLayers() {
           if (Array.isArray(this.layers) && this.layers.length) {
             return this.layers;
           }
-          const payload = await fetchSnapshotPayload(this.weights.url);
-          this.layers = decodeSnapshotLayers(payload, layerMetadata);
+          if (!this.pendingLayers) {
+            this.pendingLayers = this.fetchLayers().finally(() => {
+              this.pendingLayers = null;
+            });
+          }
+          this.layers = await this.pendingLayers;
           return this.layers;
         },
+        async fetchLayers() {
+          if (this.weights.format === "layer_delta_v1") {
+            // Delta snapshots build on their base, so the whole chain is requested concurrently while recursing.
+            const base = snapshotsById.get(this.weights.base);
+            if (!base) {
+              throw new Error(`增量快照 ${this.id} 的基准快照 ${this.weights.base} 不存在。`);
+            }
+            const [baseLayers, buffer] = await Promise.all([
+              base.loadLayers(),
+              fetchSnapshotPayload(this.weights.url, this.weights.format, this.weights.range),
+            ]);
+            return applySnapshotDelta(baseLayers, buffer, this.weights.layers, layerMetadata);
+          }
+          const payload = await fetchSnapshotPayload(this.weights.url, this.weights.format, this.weights.range);
+          return decodeSnapshotLayers(payload, layerMetadata, this.weights.format);
+        },
       };
+      snapshotsById.set(snapshot.id, snapshot);
       return snapshot;
     })
     .filter(Boolean);
+  return snapshots;
 }
 
 function formatInteger(value) {
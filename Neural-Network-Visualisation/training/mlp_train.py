@@ -6,9 +6,11 @@ import base64
 import json
 import math
 import os
-import re
+import queue
 import shutil
-from collections.abc import Sequence
+import threading
+import time
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -20,9 +22,14 @@ import torch.optim as optim
 from torch.utils.data import DataLoader
 from torchvision import datasets, transforms
 
+from timeline_container import pack_export
+from snapshot_layout import blob_layout, slugify_identifier
+from timeline_delta import DeltaEncoder, delta_weights_header
+
 MNIST_MEAN = 0.1307
 MNIST_STD = 0.3081
 BASE_DATASET_SIZE = 60_000
+WEIGHT_FORMATS = ("layer_blob_v1", "layer_array_v1", "layer_delta_v1")
 
 
 def resolve_device(preferred: str | None = None) -> torch.device:
@@ -95,17 +102,28 @@ def export_model(
     output_path: Path,
     layer_metadata: Sequence[LayerMetadata],
     timeline: Sequence[dict[str, Any]],
+    weight_format: str = "layer_blob_v1",
+    delta_encoder: DeltaEncoder | None = None,
 ) -> None:
     """Write the lightweight network metadata and timeline manifest."""
+    network = build_network_payload(layer_metadata)
+    weights: dict[str, Any] = {
+        "storage": "per_snapshot_files",
+        "format": weight_format,
+        "precision": "float16",
+    }
+    if delta_encoder is not None:
+        weights = delta_weights_header(
+            blob_layout(network["layers"]), delta_encoder.keyframe_interval, delta_encoder.threshold
+        )
+    elif weight_format == "layer_blob_v1":
+        weights["byte_order"] = "little"
+        weights["layout"] = blob_layout(network["layers"])
     payload: dict[str, Any] = {
         "version": 2,
         "dtype": "float16",
-        "weights": {
-            "storage": "per_snapshot_files",
-            "format": "layer_array_v1",
-            "precision": "float16",
-        },
-        "network": build_network_payload(layer_metadata),
+        "weights": weights,
+        "network": network,
         "timeline": list(timeline),
     }
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -126,6 +144,34 @@ def evaluate(model: nn.Module, loader: DataLoader, device: torch.device) -> floa
     return correct / total
 
 
+def load_eval_tensors(dataset: datasets.MNIST, device: torch.device) -> tuple[torch.Tensor, torch.Tensor]:
+    """Apply ToTensor + Normalize to the whole split once and keep the result on ``device``.
+
+    The arithmetic matches the per-sample transforms (scale by 1/255, then subtract the mean and
+    divide by the std in float32), so accuracies are identical to the DataLoader path.
+    """
+    images = dataset.data.to(torch.float32).div_(255.0).sub_(MNIST_MEAN).div_(MNIST_STD).unsqueeze(1)
+    return images.to(device), dataset.targets.to(device)
+
+
+def evaluate_tensors(
+    model: nn.Module,
+    images: torch.Tensor,
+    targets: torch.Tensor,
+    batch_size: int = 10_000,
+) -> float:
+    """Accuracy over pre-normalised tensors already on the model's device, in a few large batches."""
+    was_training = model.training
+    model.eval()
+    correct = torch.zeros((), dtype=torch.long, device=targets.device)
+    with torch.inference_mode():
+        for start in range(0, images.size(0), batch_size):
+            output = model(images[start : start + batch_size])
+            correct += (output.argmax(dim=1) == targets[start : start + batch_size]).sum()
+    model.train(was_training)
+    return correct.item() / targets.size(0)
+
+
 def parse_hidden_dims(raw: Sequence[int]) -> list[int]:
     dims = [int(d) for d in raw if int(d) > 0]
     if not dims:
@@ -149,8 +195,9 @@ def capture_layer_snapshots(model: SmallMLP, activations: Sequence[str]) -> list
         snapshots.append(
             LayerSnapshot(
                 metadata=metadata,
-                weight=layer.weight.detach().cpu(),
-                bias=layer.bias.detach().cpu(),
+                # Always copy: on CPU .cpu() would alias the live parameters the optimiser updates.
+                weight=layer.weight.detach().to("cpu", copy=True),
+                bias=layer.bias.detach().to("cpu", copy=True),
             )
         )
     return snapshots
@@ -179,17 +226,13 @@ def build_network_payload(layers: Sequence[LayerMetadata]) -> dict[str, Any]:
     }
 
 
-def slugify_identifier(value: str) -> str:
-    transformed = re.sub(r"[^a-z0-9]+", "-", value.lower())
-    transformed = transformed.strip("-")
-    return transformed or "snapshot"
+def tensor_to_float16_bytes(tensor: torch.Tensor) -> bytes:
+    array = tensor.detach().cpu().to(torch.float16).numpy()
+    return np.ascontiguousarray(array.astype("<f2", copy=False)).tobytes()
 
 
 def tensor_to_base64(tensor: torch.Tensor) -> str:
-    array = tensor.detach().cpu().to(torch.float16).numpy()
-    little_endian = np.ascontiguousarray(array.astype("<f2", copy=False)).view("<u2")
-    data = little_endian.tobytes()
-    return base64.b64encode(data).decode("ascii")
+    return base64.b64encode(tensor_to_float16_bytes(tensor)).decode("ascii")
 
 
 def write_snapshot_file(
@@ -197,8 +240,23 @@ def write_snapshot_file(
     directory: Path,
     order: int,
     identifier: str,
+    weight_format: str = "layer_blob_v1",
 ) -> Path:
+    """Write one snapshot as a raw float16 blob (layer_blob_v1) or base64 JSON (layer_array_v1).
+
+    A layer_blob_v1 file is every layer's row-major weights followed by its biases, in layer
+    order, as little-endian float16 with no header; the offsets are listed in the manifest.
+    """
     slug = slugify_identifier(identifier)
+    directory.mkdir(parents=True, exist_ok=True)
+    if weight_format == "layer_blob_v1":
+        path = directory / f"{order:03d}_{slug}.bin"
+        chunks: list[bytes] = []
+        for snapshot in snapshots:
+            chunks.append(tensor_to_float16_bytes(snapshot.weight))
+            chunks.append(tensor_to_float16_bytes(snapshot.bias))
+        path.write_bytes(b"".join(chunks))
+        return path
     filename = f"{order:03d}_{slug}.json"
     path = directory / filename
     layers_payload = []
@@ -224,11 +282,75 @@ def write_snapshot_file(
         "dtype": "float16",
         "layers": layers_payload,
     }
-    directory.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(payload, separators=(",", ":")))
     return path
 
 
+class SnapshotWriter:
+    """Run snapshot encoding and file I/O on a background thread, in submission order.
+
+    Jobs wait in a bounded queue, so a slow disk applies back-pressure instead of piling up
+    weight copies in memory. Leaving the ``with`` block flushes every pending job; a failed job
+    is re-raised on the next ``submit`` or on exit. With ``threaded=False`` jobs run inline,
+    which is the baseline for comparing training throughput.
+    """
+
+    def __init__(self, threaded: bool = True, max_pending: int = 8):
+        self.threaded = threaded
+        self.queue: queue.Queue[Callable[[], None] | None] = queue.Queue(maxsize=max(max_pending, 1))
+        self.error: BaseException | None = None
+        self.jobs = 0
+        self.busy_seconds = 0.0  # Time spent running jobs, on whichever thread ran them.
+        self.blocked_seconds = 0.0  # Time the training loop spent in submit().
+        self.thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        if threaded:
+            self.thread.start()
+
+    def __enter__(self) -> SnapshotWriter:
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        self.close(raise_errors=exc_type is None)
+
+    def submit(self, job: Callable[[], None]) -> None:
+        self._raise_error()
+        start = time.perf_counter()
+        if self.threaded:
+            self.queue.put(job)
+        else:
+            self._execute(job)
+        self.blocked_seconds += time.perf_counter() - start
+        self.jobs += 1
+
+    def close(self, raise_errors: bool = True) -> None:
+        if self.threaded and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if raise_errors:
+            self._raise_error()
+
+    def _run(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if self.error is None:
+                self._execute(job)
+
+    def _execute(self, job: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            job()
+        except BaseException as error:  # noqa: BLE001 - surfaced to the training loop.
+            self.error = error
+        self.busy_seconds += time.perf_counter() - start
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Writing a timeline snapshot failed.") from error
+
+
 def to_posix_relative(path: Path, base: Path) -> str:
     try:
         relative = path.relative_to(base)
@@ -371,7 +493,57 @@ def main() -> None:
         action="store_true",
         help="Skip training and just export the randomly initialised weights.",
     )
+    parser.add_argument(
+        "--weights-format",
+        choices=WEIGHT_FORMATS,
+        default="layer_blob_v1",
+        help=(
+            "Snapshot file format: raw float16 blobs (default), the older base64 JSON layer arrays, "
+            "or a float16 keyframe followed by int8-quantised deltas."
+        ),
+    )
+    parser.add_argument(
+        "--timeline-container",
+        action="store_true",
+        help="Pack all snapshots into a single <export stem>.timeline file served with range requests.",
+    )
+    parser.add_argument(
+        "--eval-batch-size",
+        type=int,
+        default=10_000,
+        help="Batch size for evaluating the in-memory test tensor (the default covers MNIST in one pass).",
+    )
+    parser.add_argument(
+        "--loader-eval",
+        action="store_true",
+        help="Evaluate through the test DataLoader with per-sample transforms instead of the in-memory tensor.",
+    )
+    parser.add_argument(
+        "--sync-writes",
+        action="store_true",
+        help="Encode and write snapshots inside the training loop instead of on a background thread.",
+    )
+    parser.add_argument(
+        "--writer-queue",
+        type=int,
+        default=8,
+        help="Maximum snapshots waiting for the background writer before training blocks.",
+    )
+    parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        default=0,
+        help="layer_delta_v1 only: store every N-th snapshot in full (0 keeps only the initial snapshot).",
+    )
+    parser.add_argument(
+        "--delta-threshold",
+        type=float,
+        default=0.0,
+        help="layer_delta_v1 only: drop weight changes smaller than this so deltas become sparse.",
+    )
     args = parser.parse_args()
+    if args.timeline_container and args.weights_format == "layer_array_v1":
+        parser.error("--timeline-container requires --weights-format layer_blob_v1 or layer_delta_v1.")
 
     device = resolve_device(args.device)
     hidden_dims = parse_hidden_dims(args.hidden_dims)
@@ -404,6 +576,23 @@ def main() -> None:
         pin_memory=pin_memory,
     )
 
+    # Compare one pass of each evaluation path up front so the run can report the time saved.
+    eval_images, eval_targets = load_eval_tensors(test_dataset, device)
+    start = time.perf_counter()
+    loader_accuracy = evaluate(model, test_loader, device)
+    loader_eval_seconds = time.perf_counter() - start
+    evaluate_tensors(model, eval_images, eval_targets, args.eval_batch_size)  # Warm-up.
+    start = time.perf_counter()
+    tensor_accuracy = evaluate_tensors(model, eval_images, eval_targets, args.eval_batch_size)
+    tensor_eval_seconds = time.perf_counter() - start
+    if tensor_accuracy != loader_accuracy:
+        print(f"Warning: in-memory evaluation gave {tensor_accuracy:.4f}, DataLoader gave {loader_accuracy:.4f}.")
+
+    def evaluate_model() -> float:
+        if args.loader_eval:
+            return evaluate(model, test_loader, device)
+        return evaluate_tensors(model, eval_images, eval_targets, args.eval_batch_size)
+
     optimizer = optim.Adam(model.parameters(), lr=args.lr)
     dataset_size = len(train_dataset)
     milestones = build_default_timeline(dataset_size)
@@ -420,6 +609,11 @@ def main() -> None:
     snapshot_dir.mkdir(parents=True, exist_ok=True)
     export_root = args.export_path.parent.resolve()
     layer_metadata: list[LayerMetadata] = []
+    delta_encoder = (
+        DeltaEncoder(args.keyframe_interval, args.delta_threshold)
+        if args.weights_format == "layer_delta_v1"
+        else None
+    )
 
     timeline_entries: list[dict[str, Any]] = []
     cumulative_loss = 0.0
@@ -431,18 +625,49 @@ def main() -> None:
     required_epochs = math.ceil(total_required_images / dataset_size) if dataset_size else 0
     target_epochs = max(args.epochs, required_epochs)
 
+    writer = SnapshotWriter(threaded=not args.sync_writes, max_pending=args.writer_queue)
+    eval_seconds = 0.0
+    eval_passes = 0
+    capture_seconds = 0.0
+
     def record_snapshot(milestone: TimelineMilestone) -> None:
-        nonlocal last_eval_accuracy, layer_metadata
-        accuracy = evaluate(model, test_loader, device)
+        nonlocal last_eval_accuracy, layer_metadata, eval_seconds, eval_passes, capture_seconds
+        start = time.perf_counter()
+        accuracy = evaluate_model()
+        eval_seconds += time.perf_counter() - start
+        eval_passes += 1
         last_eval_accuracy = accuracy
+        start = time.perf_counter()
         snapshots = capture_layer_snapshots(model, hidden_activations)
         if not layer_metadata:
             layer_metadata = [snapshot.metadata for snapshot in snapshots]
-        snapshot_path = write_snapshot_file(snapshots, snapshot_dir, len(timeline_entries), milestone.identifier)
-        weights_rel_path = to_posix_relative(snapshot_path, export_root)
+        order = len(timeline_entries)
+
+        def write_snapshot() -> None:
+            # Runs on the writer thread; snapshots holds CPU copies, so training can carry on.
+            if delta_encoder is not None:
+                arrays = [
+                    (snapshot.weight.to(torch.float16).numpy(), snapshot.bias.to(torch.float16).numpy())
+                    for snapshot in snapshots
+                ]
+                stem = f"{order:03d}_{slugify_identifier(milestone.identifier)}"
+                snapshot_path, weights_descriptor = delta_encoder.write(
+                    arrays, snapshot_dir, stem, milestone.identifier
+                )
+            else:
+                snapshot_path = write_snapshot_file(
+                    snapshots, snapshot_dir, order, milestone.identifier, args.weights_format
+                )
+                weights_descriptor = {"dtype": "float16", "format": args.weights_format}
+            entry["weights"] = {
+                "path": to_posix_relative(snapshot_path, export_root),
+                **weights_descriptor,
+                "byte_length": snapshot_path.stat().st_size,
+            }
+
         entry: dict[str, Any] = {
             "id": milestone.identifier,
-            "order": len(timeline_entries),
+            "order": order,
             "label": milestone.label,
             "kind": milestone.kind,
             "target_images": milestone.threshold_images,
@@ -453,17 +678,15 @@ def main() -> None:
             "metrics": {
                 "test_accuracy": accuracy,
             },
-            "weights": {
-                "path": weights_rel_path,
-                "dtype": "float16",
-                "format": "layer_array_v1",
-            },
+            "weights": {},  # Filled in by write_snapshot once the file exists.
         }
         if milestone.dataset_multiple is not None:
             entry["dataset_multiple"] = milestone.dataset_multiple
         if images_seen > 0:
             entry["metrics"]["avg_training_loss"] = cumulative_loss / images_seen
         timeline_entries.append(entry)
+        writer.submit(write_snapshot)
+        capture_seconds += time.perf_counter() - start
         print(
             f"[Timeline] Captured '{milestone.label}' at {images_seen:,} images "
             f"({global_step:,} batches) – accuracy: {accuracy * 100:.2f}%"
@@ -475,54 +698,84 @@ def main() -> None:
             record_snapshot(milestones[milestone_index])
             milestone_index += 1
 
-    advance_milestones()
-
-    if not args.skip_train:
-        training_complete = milestone_index >= len(milestones)
-        for epoch in range(1, target_epochs + 1):
-            if training_complete:
-                break
-            model.train()
-            epoch_loss = 0.0
-            epoch_images = 0
-            for data, target in train_loader:
-                data, target = data.to(device), target.to(device)
-                optimizer.zero_grad()
-                output = model(data)
-                loss = nn.functional.cross_entropy(output, target)
-                loss.backward()
-                optimizer.step()
-
-                batch_size = data.size(0)
-                images_seen += batch_size
-                global_step += 1
-                cumulative_loss += loss.item() * batch_size
-                epoch_loss += loss.item() * batch_size
-                epoch_images += batch_size
-
-                advance_milestones()
-                if milestone_index >= len(milestones):
-                    training_complete = True
-                    break
-
-            avg_epoch_loss = epoch_loss / epoch_images if epoch_images else 0.0
-            if not training_complete:
-                # Ensure we keep tabs on accuracy even if no milestone was reached in this epoch.
-                last_eval_accuracy = evaluate(model, test_loader, device)
-            print(
-                f"Epoch {epoch:02d} - avg loss: {avg_epoch_loss:.4f} - "
-                f"test accuracy: {last_eval_accuracy * 100:.2f}% - "
-                f"images seen: {images_seen:,}"
-            )
+    train_start = time.perf_counter()
+    with writer:
+        advance_milestones()
 
-    if not timeline_entries:
-        # If training was skipped, at least export the initial snapshot.
-        record_snapshot(milestones[0])
+        if not args.skip_train:
+            training_complete = milestone_index >= len(milestones)
+            for epoch in range(1, target_epochs + 1):
+                if training_complete:
+                    break
+                model.train()
+                epoch_loss = 0.0
+                epoch_images = 0
+                for data, target in train_loader:
+                    data, target = data.to(device), target.to(device)
+                    optimizer.zero_grad()
+                    output = model(data)
+                    loss = nn.functional.cross_entropy(output, target)
+                    loss.backward()
+                    optimizer.step()
+
+                    batch_size = data.size(0)
+                    images_seen += batch_size
+                    global_step += 1
+                    cumulative_loss += loss.item() * batch_size
+                    epoch_loss += loss.item() * batch_size
+                    epoch_images += batch_size
+
+                    advance_milestones()
+                    if milestone_index >= len(milestones):
+                        training_complete = True
+                        break
+
+                avg_epoch_loss = epoch_loss / epoch_images if epoch_images else 0.0
+                if not training_complete:
+                    # Ensure we keep tabs on accuracy even if no milestone was reached in this epoch.
+                    start = time.perf_counter()
+                    last_eval_accuracy = evaluate_model()
+                    eval_seconds += time.perf_counter() - start
+                    eval_passes += 1
+                print(
+                    f"Epoch {epoch:02d} - avg loss: {avg_epoch_loss:.4f} - "
+                    f"test accuracy: {last_eval_accuracy * 100:.2f}% - "
+                    f"images seen: {images_seen:,}"
+                )
+
+        if not timeline_entries:
+            # If training was skipped, at least export the initial snapshot.
+            record_snapshot(milestones[0])
+    train_seconds = time.perf_counter() - train_start
 
     if not layer_metadata:
         raise RuntimeError("Layer metadata could not be captured for export.")
-    export_model(args.export_path, layer_metadata, timeline_entries)
+    export_model(args.export_path, layer_metadata, timeline_entries, args.weights_format, delta_encoder)
+    if args.timeline_container:
+        container_path = pack_export(args.export_path)
+        print(f"Packed timeline snapshots into {container_path.resolve()}")
     print(f"Exported weights to {args.export_path.resolve()}")
+    mode = "synchronous" if args.sync_writes else "background"
+    print(
+        f"Timing ({mode} snapshot writes): {images_seen:,} images in {train_seconds:.1f}s "
+        f"({images_seen / train_seconds if train_seconds else 0.0:,.0f} images/s including milestones) – "
+        f"evaluation {eval_seconds:.1f}s, snapshot capture {capture_seconds:.2f}s "
+        f"(of which {writer.blocked_seconds:.2f}s waiting on writes), "
+        f"snapshot encoding/writing {writer.busy_seconds:.2f}s over {writer.jobs} snapshots"
+    )
+    loader_total = loader_eval_seconds * eval_passes
+    tensor_total = tensor_eval_seconds * eval_passes
+    print(
+        f"Evaluation: {eval_passes} passes took {eval_seconds:.1f}s "
+        f"({'DataLoader' if args.loader_eval else 'in-memory tensor'}). One pass measured "
+        f"{loader_eval_seconds * 1000:.0f} ms through the DataLoader vs {tensor_eval_seconds * 1000:.1f} ms in memory, "
+        f"so the in-memory path saves ≈{loader_total - tensor_total:.1f}s over this run "
+        f"({loader_total:.1f}s → {tensor_total:.1f}s)."
+    )
+    if delta_encoder is not None:
+        print("Max delta reconstruction error per layer (weights / biases):")
+        for meta, (weight_error, bias_error) in zip(layer_metadata, delta_encoder.max_error, strict=False):
+            print(f"  {meta.name}: {weight_error:.3e} / {bias_error:.3e}")
 
 
 if __name__ == "__main__":
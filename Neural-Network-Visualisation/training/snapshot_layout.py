@@ -0,0 +1,37 @@
+"""Naming and byte layout shared by the trainer and the timeline tools.
+
+A ``layer_blob_v1`` snapshot is every layer's row-major weights followed by its biases, in
+layer order, as little-endian float16 with no header. ``blob_layout`` lists where each array
+starts; the trainer writes it into the manifest and the delta and container tools read
+snapshots back with it.
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+ARRAY_KEYS = ("weights", "biases")
+
+
+def slugify_identifier(value: str) -> str:
+    transformed = re.sub(r"[^a-z0-9]+", "-", value.lower())
+    transformed = transformed.strip("-")
+    return transformed or "snapshot"
+
+
+def blob_layout(layers: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Byte offsets of each layer's weights and biases, given the manifest's ``network.layers``."""
+    layout: list[dict[str, Any]] = []
+    offset = 0
+    for layer in layers:
+        entry: dict[str, Any] = {"layer_index": layer["layer_index"], "name": layer["name"]}
+        for key in ARRAY_KEYS:
+            shape = layer["weight_shape"] if key == "weights" else layer["bias_shape"]
+            length = int(np.prod(shape)) * 2
+            entry[key] = {"shape": list(shape), "offset": offset, "length": length}
+            offset += length
+        layout.append(entry)
+    return layout
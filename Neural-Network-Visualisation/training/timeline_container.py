@@ -0,0 +1,194 @@
+"""Single-file timeline containers (``timeline_container_v1``).
+
+A container packs every snapshot of a ``layer_blob_v1`` or ``layer_delta_v1`` export into one
+file, so the browser fetches the timeline with one cacheable request (or byte-range requests
+for individual snapshots) instead of one request per milestone.
+
+File layout::
+
+    0   4 bytes   magic b"NNVT"
+    4   uint32    container version (1), little-endian
+    8   uint32    length of the JSON index in bytes
+    12  uint32    reserved (0)
+    16  ...       JSON index, space-padded to a multiple of 8 bytes
+    ... ...       snapshot payloads, each starting on an 8-byte boundary
+
+The index holds the network metadata, the manifest's top-level ``weights`` block (including
+the layer table) and one entry per snapshot with its ``id``, ``offset`` and ``length`` (absolute
+byte positions in the file) plus its format descriptor. The manifest's timeline entries carry
+the same ``offset``/``length`` so the browser can issue range requests without reading the
+header first.
+
+Usage::
+
+    # Pack an existing export into exports/mlp_weights.timeline and update its manifest.
+    python3 training/timeline_container.py pack exports/mlp_weights.json
+    # Summarise a container.
+    python3 training/timeline_container.py info exports/mlp_weights.timeline
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from timeline_delta import LayerArrays, apply_delta, blob_to_layers, layer_shapes, read_manifest
+
+MAGIC = b"NNVT"
+CONTAINER_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+ALIGNMENT = 8
+
+
+def pack_export(manifest_path: Path, container_path: Path | None = None, remove_files: bool = True) -> Path:
+    """Pack the per-snapshot files of an export into one container and point the manifest at it."""
+    manifest = read_manifest(manifest_path)
+    root = manifest_path.parent
+    if manifest["weights"].get("storage") != "per_snapshot_files":
+        raise ValueError(f"{manifest_path} is not a per-snapshot-file export.")
+    if manifest["weights"].get("format") == "layer_array_v1":
+        raise ValueError("layer_array_v1 exports cannot be packed; re-export as layer_blob_v1 or layer_delta_v1.")
+    container_path = container_path or manifest_path.with_suffix(".timeline")
+    relative_path = Path(os.path.relpath(container_path, root)).as_posix()
+    payloads = [(root / entry["weights"]["path"]).read_bytes() for entry in manifest["timeline"]]
+    snapshot_files = [root / entry["weights"]["path"] for entry in manifest["timeline"]]
+
+    descriptors = []
+    for entry, payload in zip(manifest["timeline"], payloads):
+        descriptor = {key: value for key, value in entry["weights"].items() if key not in ("path", "byte_length")}
+        descriptors.append({"id": entry["id"], **descriptor, "length": len(payload)})
+    weights = {
+        **manifest["weights"],
+        "storage": "timeline_container",
+        "path": relative_path,
+    }
+    index: dict[str, Any] = {
+        "version": CONTAINER_VERSION,
+        "network": manifest["network"],
+        "weights": weights,
+        "snapshots": descriptors,
+    }
+
+    # Offsets depend on the index length, which depends on the offsets; the offset digits only
+    # grow, so re-encode until the index stops changing size.
+    index_length = 0
+    while True:
+        offset = align(HEADER.size + index_length)
+        for descriptor, payload in zip(descriptors, payloads):
+            descriptor["offset"] = offset
+            offset = align(offset + len(payload))
+        index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        index_bytes += b" " * (align(HEADER.size + len(index_bytes)) - HEADER.size - len(index_bytes))
+        if len(index_bytes) == index_length:
+            break
+        index_length = len(index_bytes)
+
+    container_path.parent.mkdir(parents=True, exist_ok=True)
+    with container_path.open("wb") as handle:
+        handle.write(HEADER.pack(MAGIC, CONTAINER_VERSION, len(index_bytes), 0))
+        handle.write(index_bytes)
+        for descriptor, payload in zip(descriptors, payloads):
+            handle.write(b"\0" * (descriptor["offset"] - handle.tell()))
+            handle.write(payload)
+
+    for entry, descriptor in zip(manifest["timeline"], descriptors):
+        entry["weights"] = {
+            "path": relative_path,
+            **{key: value for key, value in descriptor.items() if key != "id"},
+        }
+    weights["byte_length"] = container_path.stat().st_size
+    manifest["weights"] = weights
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    if remove_files:
+        for path in snapshot_files:
+            path.unlink()
+        snapshot_dir = manifest_path.parent / manifest_path.stem
+        if snapshot_dir.is_dir() and not any(snapshot_dir.iterdir()):
+            shutil.rmtree(snapshot_dir)
+    return container_path
+
+
+def align(offset: int) -> int:
+    return offset + (-offset % ALIGNMENT)
+
+
+class TimelineContainer:
+    """Memory-mapped, random-access reader for a timeline container.
+
+    Keyframe arrays are read-only float16 views into the mapping, so opening a container and
+    reading a few snapshots only pages in the bytes that are touched. Delta snapshots are
+    reconstructed as float32 by walking their chain back to the nearest keyframe.
+    """
+
+    def __init__(self, path: Path):
+        with Path(path).open("rb") as handle:
+            # The mapping stays valid after the file is closed and is released with the reader.
+            self.buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length, _ = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a timeline container.")
+        if version != CONTAINER_VERSION:
+            raise ValueError(f"{path} has unsupported container version {version}.")
+        self.index: dict[str, Any] = json.loads(self.buffer[HEADER.size : HEADER.size + index_length])
+        self.snapshots: dict[str, dict[str, Any]] = {entry["id"]: entry for entry in self.index["snapshots"]}
+
+    @property
+    def ids(self) -> list[str]:
+        return [entry["id"] for entry in self.index["snapshots"]]
+
+    def payload(self, identifier: str) -> memoryview:
+        entry = self.snapshots[identifier]
+        return memoryview(self.buffer)[entry["offset"] : entry["offset"] + entry["length"]]
+
+    def layers(self, identifier: str) -> LayerArrays:
+        """Return ``[(weights, biases), ...]`` for one snapshot."""
+        if self.snapshots[identifier]["format"] == "layer_blob_v1":
+            return blob_to_layers(self.payload(identifier), self.index)
+        state = self.flat_state(identifier)
+        shapes = [shape for pair in layer_shapes(self.index) for shape in pair]
+        arrays = [array.reshape(shape) for array, shape in zip(state, shapes)]
+        return list(zip(arrays[0::2], arrays[1::2]))
+
+    def flat_state(self, identifier: str) -> list[np.ndarray]:
+        entry = self.snapshots[identifier]
+        if entry["format"] == "layer_blob_v1":
+            return [array.astype(np.float32).reshape(-1) for layer in self.layers(identifier) for array in layer]
+        return apply_delta(self.flat_state(entry["base"]), self.payload(identifier), entry["layers"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pack a weight timeline export into one file, or inspect one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="Pack a layer_blob_v1/layer_delta_v1 export into a container.")
+    pack_parser.add_argument("manifest", type=Path, help="Manifest of the export; it is rewritten in place.")
+    pack_parser.add_argument(
+        "--keep-files",
+        action="store_true",
+        help="Keep the per-snapshot files after packing.",
+    )
+    info_parser = subparsers.add_parser("info", help="List the snapshots in a container.")
+    info_parser.add_argument("container", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        path = pack_export(args.manifest, remove_files=not args.keep_files)
+        print(f"Packed {args.manifest} into {path} ({path.stat().st_size:,} bytes)")
+    else:
+        container = TimelineContainer(args.container)
+        print(f"{len(container.ids)} snapshots, format {container.index['weights']['format']}")
+        for identifier in container.ids:
+            entry = container.snapshots[identifier]
+            norms = ", ".join(f"{np.abs(weight).max():.3f}" for weight, _ in container.layers(identifier))
+            print(f"  {identifier:<16} offset {entry['offset']:>10,}  length {entry['length']:>9,}  max |w| {norms}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Delta-encoded, int8-quantised weight timelines (``layer_delta_v1``).
+
+Keyframes (the initial snapshot, plus every ``keyframe_interval``-th snapshot when set) are
+stored in full as ``layer_blob_v1`` float16 blobs. Every other snapshot stores, for each
+weight and bias array, the difference from the previous *reconstructed* snapshot quantised
+to int8 with one scale per array. Quantising against the reconstruction rather than the
+previous original keeps the error from accumulating along the chain: whatever a step rounds
+away is carried into the next delta.
+
+An array's delta section is ``dense`` (one int8 per value), ``sparse`` (a little-endian
+bitmask of the changed values followed by their int8 deltas) or ``zero`` (no bytes). Deltas smaller
+than ``threshold`` are dropped before quantisation, which makes late-training deltas mostly
+zero and therefore sparse. Sections are padded to four bytes so the browser can view them
+with typed arrays directly.
+
+Usage::
+
+    # Convert an existing float16 export into a delta export.
+    python3 training/timeline_delta.py encode exports/mlp_weights.json exports/mlp_weights_delta.json
+    # Report the reconstruction error per layer against the float16 originals.
+    python3 training/timeline_delta.py verify exports/mlp_weights_delta.json exports/mlp_weights.json
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import shutil
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from snapshot_layout import ARRAY_KEYS, blob_layout, slugify_identifier
+
+LayerArrays = list[tuple[np.ndarray, np.ndarray]]
+
+
+def layer_shapes(manifest: dict[str, Any]) -> list[tuple[tuple[int, ...], tuple[int, ...]]]:
+    return [
+        (tuple(layer["weight_shape"]), tuple(layer["bias_shape"]))
+        for layer in manifest["network"]["layers"]
+    ]
+
+
+def layers_to_blob(layers: LayerArrays) -> bytes:
+    chunks: list[bytes] = []
+    for weight, bias in layers:
+        chunks.append(np.ascontiguousarray(weight, dtype="<f2").tobytes())
+        chunks.append(np.ascontiguousarray(bias, dtype="<f2").tobytes())
+    return b"".join(chunks)
+
+
+def blob_to_layers(data: bytes, manifest: dict[str, Any]) -> LayerArrays:
+    layers: LayerArrays = []
+    for entry in blob_layout(manifest["network"]["layers"]):
+        arrays = []
+        for key in ARRAY_KEYS:
+            section = entry[key]
+            flat = np.frombuffer(data, dtype="<f2", count=section["length"] // 2, offset=section["offset"])
+            arrays.append(flat.reshape(section["shape"]))
+        layers.append((arrays[0], arrays[1]))
+    return layers
+
+
+def read_manifest(path: Path) -> dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def read_snapshot_bytes(root: Path, weights: dict[str, Any]) -> bytes:
+    """Read one snapshot's bytes from its own file or, when it has an ``offset``, from a timeline container."""
+    path = root / weights["path"]
+    if "offset" not in weights:
+        return path.read_bytes()
+    with path.open("rb") as handle:
+        handle.seek(weights["offset"])
+        return handle.read(weights["length"])
+
+
+def load_float16_snapshot(manifest: dict[str, Any], root: Path, weights: dict[str, Any]) -> LayerArrays:
+    """Load a layer_blob_v1 or layer_array_v1 snapshot as float16 arrays."""
+    data = read_snapshot_bytes(root, weights)
+    if weights.get("format") == "layer_blob_v1":
+        return blob_to_layers(data, manifest)
+    payload = json.loads(data)
+    layers: LayerArrays = []
+    for layer, (weight_shape, bias_shape) in zip(payload["layers"], layer_shapes(manifest)):
+        weight = np.frombuffer(base64.b64decode(layer["weights"]["data"]), dtype="<f2").reshape(weight_shape)
+        bias = np.frombuffer(base64.b64decode(layer["biases"]["data"]), dtype="<f2").reshape(bias_shape)
+        layers.append((weight, bias))
+    return layers
+
+
+def apply_delta(state: list[np.ndarray], data: bytes, layers: Sequence[dict[str, Any]]) -> list[np.ndarray]:
+    """Return the flat float32 arrays of ``state`` with one delta file applied.
+
+    The sum is taken in float64 and rounded once to float32, which is what the browser's
+    ``Float32Array`` assignment does, so both sides reconstruct identical values.
+    """
+    sections = [layer[key] for layer in layers for key in ARRAY_KEYS]
+    result = []
+    for previous, section in zip(state, sections, strict=True):
+        encoding = section["encoding"]
+        if encoding == "zero":
+            result.append(previous)
+            continue
+        scale = float(section["scale"])
+        updated = previous.astype(np.float64)
+        if encoding == "dense":
+            values = np.frombuffer(data, dtype=np.int8, count=previous.size, offset=section["offset"])
+            updated += values * scale
+        elif encoding == "sparse":
+            mask_length = (previous.size + 7) // 8
+            packed = np.frombuffer(data, dtype=np.uint8, count=mask_length, offset=section["offset"])
+            mask = np.unpackbits(packed, count=previous.size, bitorder="little").astype(bool)
+            values = np.frombuffer(data, dtype=np.int8, count=section["count"], offset=section["offset"] + mask_length)
+            updated[mask] += values * scale
+        else:
+            raise ValueError(f"Unknown delta encoding: {encoding!r}")
+        result.append(updated.astype(np.float32))
+    return result
+
+
+def encode_section(delta: np.ndarray, threshold: float) -> tuple[dict[str, Any], bytes]:
+    """Quantise one flat delta array to int8 and pick the smaller of the dense/sparse layouts."""
+    if threshold > 0:
+        delta = np.where(np.abs(delta) < threshold, 0.0, delta)
+    peak = float(np.abs(delta).max()) if delta.size else 0.0
+    if peak == 0.0:
+        return {"encoding": "zero"}, b""
+    scale = peak / 127
+    quantised = np.clip(np.rint(delta / scale), -127, 127).astype(np.int8)
+    mask = quantised != 0
+    count = int(np.count_nonzero(mask))
+    if count == 0:
+        return {"encoding": "zero"}, b""
+    if (quantised.size + 7) // 8 + count < quantised.size:
+        data = np.packbits(mask, bitorder="little").tobytes() + quantised[mask].tobytes()
+        section = {"encoding": "sparse", "scale": scale, "count": count}
+    else:
+        data = quantised.tobytes()
+        section = {"encoding": "dense", "scale": scale}
+    return section, data
+
+
+class DeltaEncoder:
+    """Turn a sequence of float16 snapshots into keyframe blobs and int8 delta files.
+
+    ``max_error`` holds, per layer, the largest absolute difference seen so far between a
+    reconstructed snapshot and its float16 original, as ``[weights, biases]``.
+    """
+
+    def __init__(self, keyframe_interval: int = 0, threshold: float = 0.0):
+        self.keyframe_interval = keyframe_interval
+        self.threshold = threshold
+        self.state: list[np.ndarray] | None = None
+        self.base_id: str | None = None
+        self.count = 0
+        self.max_error: list[list[float]] = []
+
+    def write(
+        self,
+        layers: LayerArrays,
+        directory: Path,
+        stem: str,
+        identifier: str,
+    ) -> tuple[Path, dict[str, Any]]:
+        """Write snapshot ``identifier`` as ``directory/stem.bin`` (keyframe) or ``stem.delta``.
+
+        Returns the path and the manifest ``weights`` descriptor without its ``path``.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        originals = [np.asarray(array, dtype=np.float16).reshape(-1) for layer in layers for array in layer]
+        keyframe = self.state is None or (self.keyframe_interval > 0 and self.count % self.keyframe_interval == 0)
+        if keyframe:
+            path = directory / f"{stem}.bin"
+            path.write_bytes(layers_to_blob(layers))
+            descriptor: dict[str, Any] = {"dtype": "float16", "format": "layer_blob_v1"}
+            self.state = [array.astype(np.float32) for array in originals]
+        else:
+            path = directory / f"{stem}.delta"
+            chunks: list[bytes] = []
+            offset = 0
+            layer_sections: list[dict[str, Any]] = []
+            for index, (previous, original) in enumerate(zip(self.state, originals, strict=True)):
+                section, data = encode_section(original.astype(np.float64) - previous, self.threshold)
+                if data:
+                    section["offset"] = offset
+                    padding = -len(data) % 4
+                    chunks.append(data + b"\0" * padding)
+                    offset += len(data) + padding
+                if index % 2 == 0:
+                    layer_sections.append({})
+                layer_sections[-1][ARRAY_KEYS[index % 2]] = section
+            data = b"".join(chunks)
+            path.write_bytes(data)
+            descriptor = {"dtype": "int8", "format": "layer_delta_v1", "base": self.base_id, "layers": layer_sections}
+            self.state = apply_delta(self.state, data, layer_sections)
+        self.track_error(originals)
+        self.base_id = identifier
+        self.count += 1
+        return path, descriptor
+
+    def track_error(self, originals: Sequence[np.ndarray]) -> None:
+        assert self.state is not None
+        errors = [
+            float(np.abs(reconstructed - original.astype(np.float32)).max(initial=0.0))
+            for reconstructed, original in zip(self.state, originals)
+        ]
+        if not self.max_error:
+            self.max_error = [[0.0, 0.0] for _ in range(len(errors) // 2)]
+        for index, error in enumerate(errors):
+            current = self.max_error[index // 2]
+            current[index % 2] = max(current[index % 2], error)
+
+
+def reconstruct_timeline(manifest_path: Path) -> Iterator[tuple[dict[str, Any], LayerArrays]]:
+    """Yield ``(timeline entry, float32 layers)`` for every snapshot of an export of any format."""
+    manifest = read_manifest(manifest_path)
+    root = manifest_path.parent
+    shapes = [shape for pair in layer_shapes(manifest) for shape in pair]
+    states: dict[str, list[np.ndarray]] = {}
+    for entry in manifest["timeline"]:
+        weights = entry["weights"]
+        if weights.get("format") == "layer_delta_v1":
+            data = read_snapshot_bytes(root, weights)
+            state = apply_delta(states[weights["base"]], data, weights["layers"])
+        else:
+            layers = load_float16_snapshot(manifest, root, weights)
+            state = [array.astype(np.float32).reshape(-1) for layer in layers for array in layer]
+        states[entry["id"]] = state
+        arrays = [array.reshape(shape) for array, shape in zip(state, shapes)]
+        yield entry, list(zip(arrays[0::2], arrays[1::2]))
+
+
+def timeline_bytes(manifest_path: Path) -> int:
+    manifest = read_manifest(manifest_path)
+    if manifest["weights"].get("storage") == "timeline_container":
+        return manifest["weights"]["byte_length"]
+    return sum((manifest_path.parent / entry["weights"]["path"]).stat().st_size for entry in manifest["timeline"])
+
+
+def encode_export(
+    source: Path,
+    destination: Path,
+    keyframe_interval: int = 0,
+    threshold: float = 0.0,
+) -> DeltaEncoder:
+    """Re-encode the float16 export at ``source`` as a layer_delta_v1 export at ``destination``."""
+    manifest = read_manifest(source)
+    snapshot_dir = destination.parent / destination.stem
+    if snapshot_dir.exists():
+        shutil.rmtree(snapshot_dir)
+    encoder = DeltaEncoder(keyframe_interval, threshold)
+    timeline = []
+    for entry in manifest["timeline"]:
+        layers = load_float16_snapshot(manifest, source.parent, entry["weights"])
+        stem = f"{entry['order']:03d}_{slugify_identifier(entry['id'])}"
+        path, descriptor = encoder.write(layers, snapshot_dir, stem, entry["id"])
+        descriptor["path"] = path.relative_to(destination.parent).as_posix()
+        timeline.append({**entry, "weights": descriptor})
+    manifest["weights"] = delta_weights_header(blob_layout(manifest["network"]["layers"]), keyframe_interval, threshold)
+    manifest["timeline"] = timeline
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    destination.write_text(json.dumps(manifest, indent=2))
+    return encoder
+
+
+def delta_weights_header(
+    layout: list[dict[str, Any]],
+    keyframe_interval: int,
+    threshold: float,
+) -> dict[str, Any]:
+    """Top-level ``weights`` block of a layer_delta_v1 manifest; ``layout`` describes the keyframes."""
+    return {
+        "storage": "per_snapshot_files",
+        "format": "layer_delta_v1",
+        "precision": "float16",
+        "byte_order": "little",
+        "layout": layout,
+        "delta": {
+            "quantization": "int8",
+            "scale": "per_array",
+            "keyframe_interval": keyframe_interval,
+            "threshold": threshold,
+        },
+    }
+
+
+def verify(candidate: Path, reference: Path) -> list[list[float]]:
+    """Return, per layer, the max absolute error ``[weights, biases]`` of ``candidate`` against ``reference``."""
+    reference_entries = {entry["id"]: layers for entry, layers in reconstruct_timeline(reference)}
+    max_error: list[list[float]] = []
+    for entry, layers in reconstruct_timeline(candidate):
+        expected = reference_entries[entry["id"]]
+        errors = [
+            [float(np.abs(got - want).max(initial=0.0)) for got, want in zip(layer, ref_layer)]
+            for layer, ref_layer in zip(layers, expected, strict=True)
+        ]
+        print(f"{entry['order']:03d} {entry['id']:<16} " + "  ".join(f"{w:.2e}/{b:.2e}" for w, b in errors))
+        if not max_error:
+            max_error = [[0.0, 0.0] for _ in errors]
+        for total, error in zip(max_error, errors):
+            total[0], total[1] = max(total[0], error[0]), max(total[1], error[1])
+    return max_error
+
+
+def print_layer_errors(manifest_path: Path, max_error: Sequence[Sequence[float]]) -> None:
+    names = [layer["name"] for layer in read_manifest(manifest_path)["network"]["layers"]]
+    for name, (weight_error, bias_error) in zip(names, max_error):
+        print(f"  {name}: max |error| weights {weight_error:.3e}, biases {bias_error:.3e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delta-encode a weight timeline export or verify one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    encode_parser = subparsers.add_parser("encode", help="Convert a float16 export to layer_delta_v1.")
+    encode_parser.add_argument("source", type=Path, help="Manifest of a layer_blob_v1 or layer_array_v1 export.")
+    encode_parser.add_argument("destination", type=Path, help="Manifest path for the delta export.")
+    encode_parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        default=0,
+        help="Store every N-th snapshot in full (0 keeps only the initial snapshot as a keyframe).",
+    )
+    encode_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.0,
+        help="Drop weight changes smaller than this before quantising (makes deltas sparse).",
+    )
+    verify_parser = subparsers.add_parser("verify", help="Report reconstruction error against a float16 export.")
+    verify_parser.add_argument("candidate", type=Path, help="Manifest of the export to check (any format).")
+    verify_parser.add_argument("reference", type=Path, help="Manifest of the float16 original export.")
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        encoder = encode_export(args.source, args.destination, args.keyframe_interval, args.threshold)
+        before, after = timeline_bytes(args.source), timeline_bytes(args.destination)
+        print(f"Timeline bytes: {before:,} -> {after:,} ({before / after:.2f}× smaller)")
+        print_layer_errors(args.destination, encoder.max_error)
+    else:
+        max_error = verify(args.candidate, args.reference)
+        print("Max reconstruction error per layer:")
+        print_layer_errors(args.candidate, max_error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+import threading
+from random import choice
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from imagebag import ImageBag, get_undone_labels, store
+from constant import bag_lease_time, bag_pool_per_label, bag_pool_threads, bag_pool_interval
+
+class BagPool:  # 后台预先生成图片包，用户提交后直接取出一个已生成好的图片包，不用等待读取数据集和编码图片
+    # pool.bags = {label: deque([ImageBag, ...])}，每个未完成的类别保持bag_pool_per_label个图片包
+    # 后台线程每隔bag_pool_interval秒释放过期的租约、为池中的图片包续期、补充图片包，
+    # 用户关闭网页后其图片包的索引会在租约过期后自动释放，不再需要手动访问/reset
+    def __init__(self, per_label=bag_pool_per_label, n_threads=bag_pool_threads):
+        self.per_label = per_label
+        self.bags = {}
+        self.pending = Counter()  # 每个类别正在生成的图片包数
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=n_threads)
+        store.expire(float('inf'))  # 服务器启动前的图片包都已失效，释放全部租约
+        self.thread = threading.Thread(target=self.__loop, daemon=True)
+        self.thread.start()
+
+    def get(self):  # 随机选取一个未完成的类别，返回该类别已生成好的图片包，池中没有时直接生成
+        undone_labels = get_undone_labels()
+        if len(undone_labels) == 0: return ImageBag()  # label为-1
+        label = choice(undone_labels)
+        with self.lock:
+            bags = self.bags.get(label)
+            bag = bags.popleft() if bags else None
+        self.__fill(label)
+        if bag is None or not bag.renew():  # 取出时续期，用户从此时开始有完整的租约时间
+            if bag is not None: bag.reset()
+            bag = ImageBag(label)
+        return bag
+
+    def __fill(self, label):  # 为label补充图片包
+        with self.lock:
+            need = self.per_label - len(self.bags.get(label, ())) - self.pending[label]
+            self.pending[label] += max(need, 0)
+        for _ in range(need):
+            self.executor.submit(self.__produce, label)
+
+    def __produce(self, label):
+        try:
+            bag = ImageBag(label)
+        except Exception as e:
+            print(f"生成类别{label}的图片包失败: {e!r}")
+            bag = None
+        with self.lock:
+            self.pending[label] -= 1
+            if bag is not None:
+                self.bags.setdefault(label, deque()).append(bag)
+
+    def __loop(self):
+        while True:
+            try:
+                self.__refresh()
+            except Exception as e:
+                print(f"图片包池更新失败: {e!r}")
+            time.sleep(bag_pool_interval)
+
+    def __refresh(self):
+        expired = store.expire()
+        if expired: print(f"释放了{expired}个过期的图片包")
+        undone_labels = set(get_undone_labels())
+        with self.lock:
+            done = [label for label in self.bags if label not in undone_labels]
+            removed = [bag for label in done for bag in self.bags.pop(label)]
+            bags = [bag for bags in self.bags.values() for bag in bags]
+        for bag in removed: bag.reset()  # 已完成筛选的类别不再需要图片包
+        for bag in bags:  # 池中的图片包在租约过半时续期
+            if time.time() - bag.renewed > bag_lease_time / 2: bag.renew()
+        for label in undone_labels: self.__fill(label)
+
+    def stats(self):  # 池中已生成和正在生成的图片包数
+        with self.lock:
+            return {'ready': sum(len(bags) for bags in self.bags.values()), 'pending': sum(self.pending.values())}
@@ -0,0 +1,62 @@
+# 比较创建图片包时读取类别数组的耗时与内存占用：完整读取(np.load)与内存映射(mmap_mode='r')
+# 每种方式在单独的子进程中运行，互不影响内存统计
+# 用法: python benchmark_imagebag.py --label cat [--repeat 20]
+#      python benchmark_imagebag.py --synthetic 150000  # 没有数据集时生成随机数组测试
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from pathlib import Path
+
+def memory_mb():  # 当前进程的常驻内存、其中的匿名内存（不含可回收的文件页）、峰值常驻内存（MB）
+    status = {}
+    with open("/proc/self/status") as file:
+        for line in file:
+            key, value = line.split(':', 1)
+            status[key] = value
+    return tuple(int(status[key].split()[0]) / 1024 for key in ['VmRSS', 'RssAnon', 'VmHWM'])
+
+def child(mode, path, repeat, n):  # 模拟repeat次创建图片包：打开类别数组并读取n张未使用过的图像
+    from imagebag import load_images
+    rng = np.random.default_rng(0)
+    base = np.array(memory_mb()[:2])
+    times, rss = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == 'full': imgs = np.load(path, encoding="latin1", allow_pickle=True)
+        else: imgs = load_images(None, path)
+        idxs = np.sort(rng.choice(len(imgs), n, replace=False))
+        selected = np.asarray(imgs[idxs])
+        times.append(time.perf_counter() - start)
+        rss.append(np.array(memory_mb()[:2]) - base)  # 图片包存在期间增加的常驻内存
+        del imgs
+    rss, anon = np.mean(rss, axis=0)
+    print(f"{mode:5}: 平均{np.mean(times)*1000:8.2f}ms 首次{times[0]*1000:8.2f}ms "
+          f"每个图片包占用内存{rss:7.1f}MB(其中匿名内存{anon:7.1f}MB) 进程峰值{memory_mb()[2]:7.1f}MB 读取{selected.shape}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--label', default=None, help="测试的类别，默认为target_labels中的第一个")
+    parser.add_argument('--synthetic', type=int, default=0, help="生成该数量的随机图像代替数据集")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--n', type=int, default=30, help="每个图片包的图像数")
+    parser.add_argument('--mode', choices=['full', 'mmap'], default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--path', type=Path, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        child(args.mode, args.path, args.repeat, args.n)
+        sys.exit()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.synthetic:
+            path = Path(tmp_dir).joinpath("synthetic.npy")
+            np.save(path, np.random.randint(0, 256, (args.synthetic, 784), dtype=np.uint8))
+        else:
+            from constant import PATH_DATASET, target_labels
+            path = PATH_DATASET.joinpath(f"{args.label or target_labels[0]}.npy")
+        print(f"{path}: {path.stat().st_size/1024**2:.1f}MB")
+        for mode in ['full', 'mmap']:
+            subprocess.run([sys.executable, __file__, '--mode', mode, '--path', str(path),
+                            '--repeat', str(args.repeat), '--n', str(args.n)], check=True)
@@ -10,6 +10,7 @@ with open(PATH_ARCHIVES.joinpath("eng_to_chn.json"), "r", encoding="utf-8") as f
 
 with open(PATH_ARCHIVES.joinpath("target_labels.txt"), "r") as file:  # 读取筛选标签
     target_labels = file.read().split('\n')[:-1]
+target_labels_set = set(target_labels)  # 用于判断标签是否在target_labels中
 
 names = ['吴天阳', '张政', '师梓豪', '苏渝钦', '王承杰', '杨涵', '孙一珺', '程思诚']
 # target_labels = ['ant', 'apple', 'axe']
@@ -23,15 +24,18 @@ def check_dir(path): path.mkdir(parents=True, exist_ok=True)
 PATH_DATASET = Path(r"/home/wty/Coding/datasets/quick_draw")  # 数据集位置
 PATH_LOGS = Path.cwd().joinpath("logs")  # 日志位置，当前路径下的logs文件夹
 check_dir(PATH_LOGS)
-PATH_CACHE = Path.cwd().joinpath("static/cache")  # 图片缓存位置，当前路径下的cache文件夹
-check_dir(PATH_CACHE)
 PATH_SELECTED = Path.cwd().joinpath("selected")  # 筛选好的图片保存位置，当前路径下的selected文件夹
 check_dir(PATH_SELECTED)
-for label in target_labels:  # 在缓存和筛选好的图片保存路径中创建类别对应的文件夹
-    check_dir(PATH_CACHE.joinpath(label))
+for label in target_labels:  # 在筛选好的图片保存路径中创建类别对应的文件夹
     check_dir(PATH_SELECTED.joinpath(label))
 
 # HTML
 img_show_row = 10  # 网页中每行显示的图片数
 img_show_column = 3  # 网页中每列显示的图片数
 img_show_total = img_show_row * img_show_column  # 显示的总图片数
+
+# 图片包
+bag_lease_time = 30 * 60  # 用户超过该时间（秒）未提交图片包，其中的图片索引自动释放给其他用户
+bag_pool_per_label = 1  # 每个未完成的类别预先生成的图片包数
+bag_pool_threads = 2  # 后台生成图片包的线程数
+bag_pool_interval = 10  # 后台检查租约过期、补充图片包的间隔（秒）
@@ -1,94 +1,77 @@
-import pickle
+import time
+import base64
 import numpy as np
-from pathlib import Path
+from io import BytesIO
 from random import choice
 from PIL import Image
-from constant import target_labels, target_counts, img_show_total
-from constant import PATH_DATASET, PATH_LOGS, PATH_CACHE, PATH_SELECTED
+from constant import target_labels_set, target_counts, img_show_total, bag_lease_time
+from constant import PATH_DATASET, PATH_LOGS, PATH_SELECTED
+from store import Store, PATH_DB
+from progress import Progress
 
-PATH_SELECTED_COUNTS = PATH_LOGS.joinpath("selected_counts.pkl")
+def load_images(label, path=None):  # 以只读内存映射方式打开label类别的全部图像，只有实际读取的图像才会载入内存
+    # 图像数组需为普通的uint8数组(N, 784)，旧的pickle格式（object数组）无法内存映射，
+    # 此时退回到完整读取，并提示执行 python migrate_dataset.py 转换一次
+    path = PATH_DATASET.joinpath(f"{label}.npy") if path is None else path
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        print(f"{path}为pickle格式，无法内存映射，请执行 python migrate_dataset.py 进行转换")
+        return np.load(path, encoding="latin1", allow_pickle=True)
 
-def load_file(path:Path):  # 用pickle读取path中文件
-    assert(path.exists())
-    with open(path, 'rb') as file:
-        ret = pickle.load(file)
-    return ret
+def encode_png(img):  # 将28x28的灰度图像编码为PNG
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format='png')
+    return buffer.getvalue()
 
-def save_file(obj, path:Path):  # 用pickle保存obj数据到path中
-    with open(path, 'wb') as file:
-        pickle.dump(obj, file)
+def get_undone_labels():  # 还未达到目标筛选数量并且在target_labels中的label
+    return [label for label in store.undone_labels(target_counts) if label in target_labels_set]
 
 class ImageBag:  # 用户与网页交互时显示的图片包
-    # bag.label为当前图片包的标签
-    # bag.paths为当前图片包中每个图片的路径
-    def __init__(self):
-        undone_labels = []  # 选出还未达到目标筛选数量的label并且在target_labels中
-        for label, count in selected_counts.items():
-            if label not in target_labels: continue
-            if count < target_counts:
-                undone_labels.append(label)
-        if len(undone_labels) > 0:
-            self.label = choice(undone_labels)  # 从中随机选出一个label作为当前的图像包标签
-        else: self.label = -1; return
+    # bag.label为当前图片包的标签，label为None时从未完成的类别中随机选取
+    # bag.pngs为当前图片包中每个图片的PNG编码，bag.urls为对应的data URI
+    # bag.lease为图片包选取的索引的租约，超过bag_lease_time未续期或提交，索引会被释放给其他图片包
+    def __init__(self, label=None):
+        if label is None:
+            undone_labels = get_undone_labels()
+            if len(undone_labels) > 0:
+                label = choice(undone_labels)  # 从中随机选出一个label作为当前的图像包标签
+            else: self.label = -1; return
+        self.label = label
         # 读取图像
-        imgs = np.load(PATH_DATASET.joinpath(f"{self.label}.npy"), encoding="latin1", allow_pickle=True)
-        # 读取当前标签已使用过的索引
-        self.path_label_used_idxs = PATH_LOGS.joinpath(f"{self.label}_used_idxs.pkl")
-        used_idxs = load_file(self.path_label_used_idxs)  # set类型
-        self.idxs = []  # 顺次选取img_show_total个未使用过的索引，准备显示到网页上
-        for i in range(imgs.shape[0]):
-            if i not in used_idxs:
-                self.idxs.append(i)
-                used_idxs.add(i)  # 将当前用过的索引加入used_idxs中，避免其他用户选到相同图片
-            if len(self.idxs) == img_show_total: break
-        save_file(used_idxs, self.path_label_used_idxs)
-        imgs = imgs[self.idxs]  # 选出特定索引的图像
+        imgs = load_images(self.label)
+        # 顺次选取img_show_total个未使用过的索引，准备显示到网页上，并标记为已使用
+        self.lease, self.idxs = store.claim(self.label, len(imgs), img_show_total, bag_lease_time)
+        self.renewed = time.time()
+        imgs = np.asarray(imgs[self.idxs])  # 选出特定索引的图像，只从磁盘读取这些图像所在的页
 
-        self.paths = []  # 当前缓存中的图像路径
-        for img, idx in zip(imgs, self.idxs):  # 加载到缓存中
-            path = PATH_CACHE.joinpath(f"{self.label}/{idx}.png")
-            Image.fromarray(img.reshape(28,28)).save(path)
-            self.paths.append(path)
+        # 图片只以PNG编码保存在内存中，网页中以data URI直接显示，不再写入缓存文件夹
+        self.pngs = [encode_png(img.reshape(28,28)) for img in imgs]
+        self.urls = ["data:image/png;base64," + base64.b64encode(png).decode() for png in self.pngs]
 
-    def update(self, html_idxs):  # 根据用户网页上筛选的图片索引html_idxs，保存图片
-        selected_counts[self.label] += len(html_idxs)
-        save_file(selected_counts, PATH_SELECTED_COUNTS)
-        for idx in html_idxs:  # 移动筛选出的图片
-            path = self.paths[idx]
-            path.replace(PATH_SELECTED.joinpath(f"{self.label}/" + path.name))
-        self.__remove()
+    def renew(self):  # 租约续期，租约已过期时返回False
+        self.renewed = time.time()
+        return store.renew(self.lease, bag_lease_time)
 
-    def __remove(self):  # 删除图片包中的所有图片
-        for path in self.paths:
-            if path.exists(): path.unlink()
+    def update(self, html_idxs):  # 根据用户网页上筛选的图片索引html_idxs，保存图片，租约已过期时不保存并返回False
+        if not store.commit(self.lease, len(html_idxs)): return False
+        path = PATH_SELECTED.joinpath(self.label)
+        for idx in html_idxs:  # 只将筛选出的图片写入磁盘
+            path.joinpath(f"{self.idxs[idx]}.png").write_bytes(self.pngs[idx])
+        progress.add(self.label, len(html_idxs))
+        return True
 
     def reset(self):  # 当用户未完成当前的图片包图像选择，则将当前锁定的索引重新解锁
-        used_idxs = load_file(self.path_label_used_idxs)
-        for idx in self.idxs:
-            used_idxs.remove(idx)
-        save_file(used_idxs, self.path_label_used_idxs)
-        self.__remove()
+        store.release(self.lease)
 
-# 下面分别检查./logs目录下
-# "selected_counts.pkl"和每个label对应的f"{label}_used_idxs.pkl"是否存在
-# 若不存在则进行创建，并读取selected_counts.pkl文件
-selected_counts = {}  # 每个标签已筛选出的数目，用字典保存
-# {'label1': num1, 'label2': num2, ...}
-if not PATH_SELECTED_COUNTS.exists():
-    for label in target_labels:
-        selected_counts[label] = 0
-    save_file(selected_counts, PATH_SELECTED_COUNTS)
-else:
-    selected_counts = load_file(PATH_SELECTED_COUNTS)
-
-for label in target_labels:  # 每个标签已用过的图片索引，用set保存
-    # label1_used_idxs.pkl用set存储label1中已用过的索引
-    path = PATH_LOGS.joinpath(f"{label}_used_idxs.pkl")
-    if not path.exists():
-        save_file(set(), path)  # 初始化为空set
+# 筛选进度保存在SQLite数据库中，旧版本的pickle文件需要先执行python store.py导入一次
+if not PATH_DB.exists() and PATH_LOGS.joinpath("selected_counts.pkl").exists():
+    raise BaseException(f"检测到旧版本的筛选进度文件，请先执行 python store.py 导入到{PATH_DB}")
+store = Store()
+progress = Progress(store.selected_counts())  # 首页的筛选进度统计，每次提交时更新
 
 if __name__ == '__main__':
     bag = ImageBag()
-    print(bag.label, bag.paths)
+    print(bag.label, bag.idxs)
     input("继续？")
     bag.reset()
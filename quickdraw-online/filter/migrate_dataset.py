@@ -0,0 +1,47 @@
+# 将数据集中pickle格式（object数组）的类别文件一次性转换为普通的uint8数组(N, 784)，
+# 转换后imagebag.py可以用内存映射方式打开，每个图片包只读取用到的图像
+# 用法: python migrate_dataset.py [--dataset 数据集路径] [--all] [--keep-backup] [--dry-run]
+import argparse
+import numpy as np
+from pathlib import Path
+from constant import PATH_DATASET, target_labels
+
+def is_mappable(path):  # 文件是否已经可以内存映射
+    try:
+        imgs = np.load(path, mmap_mode='r')
+    except ValueError:
+        return False
+    return imgs.dtype == np.uint8 and imgs.ndim == 2
+
+def convert(path, keep_backup):  # 读取pickle格式的文件并保存为uint8数组，先写临时文件再替换，避免中断时损坏原文件
+    imgs = np.load(path, encoding="latin1", allow_pickle=True)
+    imgs = np.stack([np.asarray(img, dtype=np.uint8).reshape(-1) for img in imgs])
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as file:  # np.save会给不以.npy结尾的路径添加后缀，所以传入文件对象
+        np.save(file, imgs)
+    if keep_backup:
+        path.replace(path.with_name(path.name + ".bak"))
+    tmp_path.replace(path)
+    return imgs.shape
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', type=Path, default=PATH_DATASET, help="数据集路径，默认为constant.py中的PATH_DATASET")
+    parser.add_argument('--all', action='store_true', help="转换数据集中全部的类别，默认只转换target_labels")
+    parser.add_argument('--keep-backup', action='store_true', help="将原文件保留为.npy.bak")
+    parser.add_argument('--dry-run', action='store_true', help="只列出需要转换的文件")
+    args = parser.parse_args()
+
+    if args.all: paths = sorted(args.dataset.glob("*.npy"))
+    else: paths = [args.dataset.joinpath(f"{label}.npy") for label in target_labels]
+    converted = 0
+    for path in paths:
+        if not path.exists():
+            print(f"{path}不存在，跳过"); continue
+        if is_mappable(path): continue
+        converted += 1
+        if args.dry_run:
+            print(f"需要转换: {path}"); continue
+        shape = convert(path, args.keep_backup)
+        print(f"已转换{path}，形状{shape}")
+    print(f"共检查{len(paths)}个文件，{'需要' if args.dry_run else '已'}转换{converted}个")
@@ -0,0 +1,65 @@
+import bisect
+import threading
+import numpy as np
+from constant import target_labels, target_labels_set, target_counts, total_targets, eng_to_chn
+
+def get_message(label, num):  # 类别label已筛选num张图片的文本信息
+    message = f"类别{label} {eng_to_chn[label]}"
+    if num >= target_counts:
+        message += f"已完成全部筛选，总共筛选了{num}张图片"
+        delta = num - target_counts
+        if delta > 0:
+            message += f"并且多筛选了{delta}幅图片！"
+    else:
+        message += f"已筛选{num}/{target_counts}个，还差{target_counts - num}个"
+    return message
+
+class Progress:  # 首页显示的筛选进度统计，启动时从数据库读取一次，之后每次提交只更新被提交的类别
+    # progress.keys为按(已筛选数目, 标签)升序排列的列表，messages、num_label与其一一对应，首页从多到少显示时反向遍历即可
+    # 更新时复制一份新的列表再替换，正在渲染网页的线程读到的列表不会被修改，所以infos()不用复制列表
+    def __init__(self, selected_counts):  # selected_counts = [(label, 已筛选数目), ...]
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.keys, self.messages, self.num_label = [], [], []
+        self.complete_count = 0  # 已完成筛选的类别数
+        self.extra = 0  # 已完成的类别中超出目标数的图片数
+        for label, num in selected_counts:
+            if label in target_labels_set: self.__insert(label, num)
+
+    def __insert(self, label, num):
+        self.counts[label] = num
+        idx = bisect.bisect(self.keys, (num, label))
+        self.keys.insert(idx, (num, label))
+        self.messages.insert(idx, get_message(label, num))
+        self.num_label.insert(idx, (num, label, eng_to_chn[label], np.round(num/target_counts*100,2)))
+        if num >= target_counts:
+            self.complete_count += 1
+            self.extra += num - target_counts
+
+    def __remove(self, label):
+        num = self.counts.pop(label)
+        idx = bisect.bisect_left(self.keys, (num, label))
+        del self.keys[idx], self.messages[idx], self.num_label[idx]
+        if num >= target_counts:
+            self.complete_count -= 1
+            self.extra -= num - target_counts
+
+    def add(self, label, num):  # 类别label新筛选出num张图片
+        if label not in target_labels_set: return
+        with self.lock:
+            self.keys, self.messages, self.num_label = self.keys.copy(), self.messages.copy(), self.num_label.copy()
+            total = self.counts[label] + num
+            self.__remove(label)
+            self.__insert(label, total)
+
+    def infos(self):
+        # 处理HTML现实的与类别相关的信息，分别为
+        # messages每个类别已经筛选图片数的文本信息
+        # num_label每个类别已筛选的个数和对应的英中文标签，进度比例
+        # total_target目标筛选图片数
+        # complete_count已完成筛选的类别数
+        # complete_all_flag已完成全部筛选标签
+        with self.lock:
+            return {'messages': reversed(self.messages), 'num_label': enumerate(reversed(self.num_label)),
+                    'total_target': total_targets + self.extra, 'complete_count': self.complete_count,
+                    'complete_all_flag': self.complete_count == len(target_labels)}
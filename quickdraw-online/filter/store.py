@@ -0,0 +1,189 @@
+import time
+import pickle
+import sqlite3
+import threading
+import numpy as np
+from contextlib import contextmanager
+from constant import PATH_LOGS, names, target_labels
+PATH_DB = PATH_LOGS.joinpath("filter.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (  -- 每个类别已筛选出的图片数，cursor之前的索引均已使用
+    label TEXT PRIMARY KEY,
+    selected INTEGER NOT NULL DEFAULT 0,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    used BLOB NOT NULL DEFAULT X''  -- 已使用（已提交或正在显示）的图片索引，按位压缩的bitset，第i张图片对应第i//8个字节的第i%8位
+);
+CREATE INDEX IF NOT EXISTS labels_selected ON labels (selected, label);
+CREATE TABLE IF NOT EXISTS used_idxs (  -- 正在显示的图片索引，租约释放时需要据此清除labels.used中的位
+    label TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    lease INTEGER NOT NULL,  -- 图片所属的租约，提交后删除，只在labels.used中保留
+    PRIMARY KEY (label, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS used_idxs_lease ON used_idxs (lease);
+CREATE TABLE IF NOT EXISTS leases (  -- 图片包选取的索引在expires之前有效，过期后自动释放
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_expires ON leases (expires);
+CREATE TABLE IF NOT EXISTS mark (  -- 每个用户已标记的数目和已显示的图片数目
+    name TEXT PRIMARY KEY,
+    selected INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class Store:  # 筛选进度的存储，所有用户共用一个WAL模式的SQLite数据库logs/filter.db
+    # 每次提交只更新几行数据，且在事务中完成，多个用户同时提交不会相互覆盖
+    # sqlite3的连接不能在线程间共用，Flask每个处理请求的线程各自打开一个连接
+    def __init__(self, path=PATH_DB):
+        self.path = path
+        self.local = threading.local()
+        self.connect().executescript(SCHEMA)
+        with self.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO labels (label) VALUES (?)", [(label,) for label in target_labels])
+            db.executemany("INSERT OR IGNORE INTO mark (name) VALUES (?)", [(name,) for name in names])
+
+    def connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            # isolation_level=None: 由transaction()显式开始和提交事务
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    @contextmanager
+    def transaction(self):  # BEGIN IMMEDIATE在事务开始时就获取写锁，避免两个事务读到相同的cursor
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def selected_counts(self):  # [(label, 已筛选数目), ...]，按已筛选数目从多到少排序
+        return self.connect().execute(
+            "SELECT label, selected FROM labels ORDER BY selected DESC, label DESC").fetchall()
+
+    def undone_labels(self, target):  # 已筛选数目还未达到target的类别
+        return [label for label, in self.connect().execute(
+            "SELECT label FROM labels WHERE selected < ?", (target,))]
+
+    def claim(self, label, n, k, lease_time):  # 从label的n张图片中按顺序选出k个未使用的索引，租约lease_time秒后过期
+        # 返回(租约id, 索引列表)，租约过期前需要commit提交或renew续期，否则索引会被expire释放
+        with self.transaction() as db:
+            cursor, used = db.execute("SELECT cursor, used FROM labels WHERE label = ?", (label,)).fetchone()
+            # 每张图片只占一位，整个bitset只有几十KB，直接读出后从cursor开始查找
+            # cursor之后已使用的索引只有被提前释放的空缺，一般很少
+            bits = unpack_bits(used, n)
+            idxs = (np.flatnonzero(bits[cursor:n] == 0)[:k] + cursor).tolist()
+            bits[idxs] = 1
+            lease = db.execute("INSERT INTO leases (label, expires) VALUES (?, ?)",
+                               (label, time.time() + lease_time)).lastrowid
+            db.executemany("INSERT INTO used_idxs (label, idx, lease) VALUES (?, ?, ?)", [(label, i, lease) for i in idxs])
+            # 选取是按顺序进行的，所以最后一个选出的索引之前都已使用
+            db.execute("UPDATE labels SET cursor = ?, used = ? WHERE label = ?",
+                       (idxs[-1] + 1 if idxs else n, pack_bits(bits), label))
+        return lease, idxs
+
+    def renew(self, lease, lease_time):  # 租约续期，租约已过期（索引可能已被其他图片包选取）时返回False
+        with self.transaction() as db:
+            return db.execute("UPDATE leases SET expires = ? WHERE id = ? AND expires >= ?",
+                              (time.time() + lease_time, lease, time.time())).rowcount == 1
+
+    def commit(self, lease, selected_num):  # 提交图片包：租约中的索引标记为已使用，类别的已筛选数目增加selected_num
+        with self.transaction() as db:
+            row = db.execute("SELECT label FROM leases WHERE id = ? AND expires >= ?", (lease, time.time())).fetchone()
+            if row is None: return False
+            db.execute("DELETE FROM used_idxs WHERE lease = ?", (lease,))  # 索引在labels.used中已标记
+            db.execute("DELETE FROM leases WHERE id = ?", (lease,))
+            db.execute("UPDATE labels SET selected = selected + ? WHERE label = ?", (selected_num, row[0]))
+        return True
+
+    def release(self, lease):  # 放弃图片包，租约中的索引重新标记为未使用
+        with self.transaction() as db:
+            self.__release(db, lease)
+
+    def expire(self, now=None):  # 释放所有已过期的租约，返回释放的租约数
+        now = time.time() if now is None else now
+        with self.transaction() as db:
+            leases = [lease for lease, in db.execute("SELECT id FROM leases WHERE expires < ?", (now,))]
+            for lease in leases: self.__release(db, lease)
+        return len(leases)
+
+    def __release(self, db, lease):  # 清除租约中的索引在bitset中的位，cursor移回最小的索引
+        row = db.execute("SELECT label FROM leases WHERE id = ?", (lease,)).fetchone()
+        idxs = [idx for idx, in db.execute("SELECT idx FROM used_idxs WHERE lease = ?", (lease,))]
+        if row is not None and idxs:
+            used, = db.execute("SELECT used FROM labels WHERE label = ?", row).fetchone()
+            bits = unpack_bits(used)
+            bits[idxs] = 0
+            db.execute("UPDATE labels SET cursor = MIN(cursor, ?), used = ? WHERE label = ?",
+                       (min(idxs), pack_bits(bits), row[0]))
+        db.execute("DELETE FROM used_idxs WHERE lease = ?", (lease,))
+        db.execute("DELETE FROM leases WHERE id = ?", (lease,))
+
+    def used_count(self, label):
+        used, = self.connect().execute("SELECT used FROM labels WHERE label = ?", (label,)).fetchone()
+        return int(unpack_bits(used).sum())
+
+    def mark(self):  # {name: [已标记数目, 已显示图片数目], ...}
+        return {name: [selected, total] for name, selected, total in
+                self.connect().execute("SELECT name, selected, total FROM mark")}
+
+    def add_mark(self, name, selected_num, total_num):
+        with self.transaction() as db:
+            db.execute("UPDATE mark SET selected = selected + ?, total = total + ? WHERE name = ?",
+                       (selected_num, total_num, name))
+
+def unpack_bits(used, n=0):  # labels.used转换为每张图片一个元素的uint8数组，长度不足n时补零
+    # 不用unpackbits的count参数补零，numpy 1.23中输入为空时补出的不是零
+    used += bytes(max(0, (n + 7) // 8 - len(used)))
+    return np.unpackbits(np.frombuffer(used, dtype=np.uint8), bitorder='little')
+
+def pack_bits(bits):
+    return np.packbits(bits, bitorder='little').tobytes()
+
+def load_pickle(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+def old_used_idxs(label):  # 读取旧版本{label}_used_idxs.pkl中保存的已使用索引（set）
+    for path in [PATH_LOGS.joinpath(f"{label}_used_idxs.pkl"), PATH_LOGS.joinpath(f"{label}_used_idxs.pkl.bak")]:
+        if path.exists(): return sorted(load_pickle(path))
+    return []
+
+def migrate(store):  # 将旧版本的selected_counts.pkl、mark.pkl和每个类别的已使用索引导入数据库
+    with store.transaction() as db:
+        path = PATH_LOGS.joinpath("selected_counts.pkl")
+        if path.exists():
+            db.executemany("UPDATE labels SET selected = ? WHERE label = ?",
+                           [(count, label) for label, count in load_pickle(path).items()])
+        path = PATH_LOGS.joinpath("mark.pkl")
+        if path.exists():
+            db.executemany("UPDATE mark SET selected = ?, total = ? WHERE name = ?",
+                           [(value[0], value[1], name) for name, value in load_pickle(path).items()
+                            if name not in ('selected', 'total')])
+        for label in target_labels:
+            idxs = old_used_idxs(label)
+            bits = np.zeros(max(idxs, default=-1) + 1, dtype=np.uint8)
+            bits[idxs] = 1
+            db.execute("UPDATE labels SET used = ? WHERE label = ?", (pack_bits(bits), label))
+            # 旧版本按顺序选取，从0开始连续使用的部分可以直接跳过
+            cursor = next((i for i, idx in enumerate(idxs) if idx != i), len(idxs))
+            db.execute("UPDATE labels SET cursor = ? WHERE label = ?", (cursor, label))
+
+if __name__ == '__main__':  # 一次性导入旧版本pickle文件中的筛选进度
+    if PATH_DB.exists():
+        print(f"{PATH_DB}已存在，不再导入")
+    else:
+        store = Store()
+        migrate(store)
+        print(f"已导入到{PATH_DB}: 已筛选{sum(count for _, count in store.selected_counts())}张，"
+              f"已使用索引{sum(store.used_count(label) for label in target_labels)}个")
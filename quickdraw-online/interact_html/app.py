@@ -1,17 +1,41 @@
+from argparse import ArgumentParser
+from async_mode import ASYNC_MODES, monkey_patch
+
+parser = ArgumentParser()
+parser.add_argument('--host', default='0.0.0.0')
+parser.add_argument('--port', type=int, default=5000)
+parser.add_argument('--async-mode', choices=ASYNC_MODES, default='threading',
+                    help="threading为Flask自带的开发服务器，eventlet/gevent为协程服务器，适合大量同时在线的用户")
+parser.add_argument('--workers', type=int, default=None, help="推理子进程数，默认使用constant.py中的inference_workers")
+parser.add_argument('--debug', action='store_true')
+if __name__ == '__main__':
+    # 协程模式需要在导入其他模块之前替换标准库中的阻塞操作
+    args = parser.parse_args()
+    monkey_patch(args.async_mode)
+
 from manager import Manager, clean_cache, PATH_CACHE
-from model import Model
-from flask import Flask, request, render_template, redirect, url_for
+from batcher import BatchPredictor
+from cache import PredictionCache
+from preprocess import preprocess
+from rasterize import parse_strokes
+from flask import Flask, request, render_template, redirect, jsonify, send_from_directory, abort
 from flask_socketio import SocketIO, emit
-from constant import target_labels, eng_to_chn
+from constant import target_labels, eng_to_chn, batch_max_size, batch_max_wait, cache_max_items, cache_ttl
+from constant import inference_workers, PATH_DATASET, PATH_SPRITES, sprite_manifest
 
-clean_cache(PATH_CACHE)
-manager = Manager()
-# model = Model('cnn')
-model = Model('deeper_cnn')
+# 推理子进程以spawn方式启动时会重新导入本文件，所以模型、用户管理等只在__main__中创建
+def build_predictor(name, n_workers):  # n_workers为0时在主进程中推理，否则交给n_workers个推理子进程
+    if n_workers > 0:
+        from workers import InferencePool
+        model = InferencePool(name, n_workers)
+    else:
+        from model import Model
+        model = Model(name)
+    return BatchPredictor(model, batch_max_size, batch_max_wait)  # 合并多个用户的预测请求
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret_key'
-socketio = SocketIO(app)
+socketio = SocketIO()  # 在__main__中根据--async-mode初始化
 
 @app.route('/', methods=["POST", "GET"])
 def index():
@@ -26,30 +50,90 @@ def interact(id):
     user = manager.get_user(id)
     if not user:
         return redirect("/")
+    user.reset_seq()  # 刷新或新开网页后序号从0重新开始
     return render_template("interact.html",
-                           table=user.table)
+                           table=user.table, sprite=manager.reference.sprite)
+
+def get_socket_user(data):  # 用户长时间未访问已被淘汰时，通知网页重新进入
+    user = manager.get_user(int(data['id']))
+    if not user: emit('expired')
+    return user
 
 @socketio.on('refresh')
 def reflesh(data):
-    id = int(data['id'])
-    user = manager.get_user(id)
+    user = get_socket_user(data)
+    if not user: return
     user.get_table()
     emit('update_show', {'table': user.table})
 
+def predict_and_emit(user, img, seq):
+    # 预处理在当前线程完成，前向传播交给predictor与其他用户的请求合并为一个batch
+    # 若在排队期间该用户又上传了更新的画板，当前请求会被丢弃，不再返回结果
+    x = preprocess(img)
+    key, table_data = cache.get(x)
+    if table_data is None:
+        table_data = predictor.predict_table(x, key=(user.id, user.epoch), seq=seq)
+        if table_data is None: return
+        cache.put(key, table_data)
+    emit('update_data', {'table_data': table_data, 'seq': seq})
+
+def parse_seq(data):
+    # 网页上传的(epoch, seq)，旧网页没有epoch和seq时分别为None和0，格式错误时返回None
+    epoch, seq = data.get('epoch'), data.get('seq', 0)
+    if epoch is not None and not (isinstance(epoch, str) and len(epoch) <= 64): return None
+    if isinstance(seq, bool) or not isinstance(seq, int) or seq < 0: return None
+    return epoch, seq
+
+def is_stale(user, epoch, seq):
+    # 每个网页生成一个随机的epoch，每次上传带有递增的序号seq，同一网页比已收到的序号旧的请求直接丢弃
+    # 网页刷新或同一用户打开了另一个网页时epoch不同，序号重新开始计算
+    if epoch == user.epoch and seq and seq <= user.seq:
+        predictor.skip()
+        return True
+    user.epoch, user.seq = epoch, seq
+    return False
+
 @socketio.on('upload_image')
 def handle_upload_image(data):
     # print(data)
-    id = int(data['id'])
-    # print(id)
-    user = manager.get_user(id)
-    user.update_img(data['image_data'])
+    parsed_seq = parse_seq(data)
+    if parsed_seq is None: return
+    epoch, seq = parsed_seq
+    user = get_socket_user(data)
+    if not user or is_stale(user, epoch, seq): return
+    img = user.update_img(data['image_data'])
     # table_data = user.test_table()
-    table_data = model.predict_table(user.img)
-    # print(table_data)
-    emit('update_data',
-        # 'image_url' 已经不用了，原本测试是将画版而文件重新显示出来
-        {'image_url': url_for("static", filename=user.get_relative_path()),
-         'table_data': table_data})
+    predict_and_emit(user, img, seq)
+
+@socketio.on('upload_strokes')
+def handle_upload_strokes(data):
+    # 网页只上传笔画坐标（QuickDraw格式），比上传整张画板的PNG小一个数量级，也不用解码PNG
+    # 数据格式错误或尺寸不合理时直接忽略，不返回结果
+    parsed = parse_strokes(data.get('strokes'), data.get('sizes'), data.get('width'), data.get('height'))
+    if parsed is None: return
+    parsed_seq = parse_seq(data)
+    if parsed_seq is None: return
+    epoch, seq = parsed_seq
+    user = get_socket_user(data)
+    if not user or is_stale(user, epoch, seq): return
+    img = user.update_strokes(*parsed)
+    predict_and_emit(user, img, seq)
+
+@app.route('/reference/<label>/<name>')
+def reference(label, name):  # 参考图片直接从数据集文件夹读取，浏览器可以缓存
+    if not manager.reference.exists(label, name): abort(404)
+    return send_from_directory(PATH_DATASET.joinpath(label), name, max_age=24*3600)
+
+@app.route('/sprites/<name>')
+def sprites(name):  # 精灵图文件名带有内容哈希，内容不会改变，浏览器可以长期缓存；清单每次向服务器确认是否更新
+    if name == sprite_manifest:
+        response = send_from_directory(PATH_SPRITES, name, max_age=0)
+        response.cache_control.no_cache = True
+        return response
+    if manager.reference.sprite is None or manager.reference.manifest['file'] != name: abort(404)
+    response = send_from_directory(PATH_SPRITES, name, max_age=365*24*3600)
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/info/')
 def info():
@@ -62,5 +146,17 @@ def info():
             labels = []
     return render_template("info.html", table=table)
 
+@app.route('/stats/')
+def stats():  # 批处理队列长度、batch大小直方图、请求延迟、缓存命中率、在线用户数，用于负载下调参
+    return jsonify({**predictor.stats(), 'cache': cache.stats(), 'sessions': manager.stats()})
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    clean_cache(PATH_CACHE)
+    manager = Manager()
+    n_workers = inference_workers if args.workers is None else args.workers
+    # predictor = build_predictor('cnn', n_workers)
+    predictor = build_predictor('deeper_cnn', n_workers)
+    cache = PredictionCache(cache_max_items, cache_ttl)  # 相同图像的预测结果缓存
+    socketio.init_app(app, async_mode=args.async_mode)
+    options = {'allow_unsafe_werkzeug': True} if args.async_mode == 'threading' else {}  # threading模式下使用Werkzeug服务器
+    socketio.run(app, host=args.host, port=args.port, debug=args.debug, use_reloader=False, **options)
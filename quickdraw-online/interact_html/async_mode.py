@@ -0,0 +1,24 @@
+# 服务器的异步模式：threading为Flask自带的多线程服务器，eventlet/gevent为协程服务器，可支持更多同时在线的websocket连接
+# 协程模式下所有“线程”都运行在同一个系统线程的事件循环中，TensorFlow的前向传播会阻塞整个事件循环，
+# 所以阻塞的计算需要通过run_blocking交给真正的系统线程池执行
+ASYNC_MODES = ['threading', 'eventlet', 'gevent']
+mode = 'threading'
+
+def monkey_patch(async_mode):  # 必须在导入其他模块（threading、socket等）之前调用
+    global mode
+    mode = async_mode
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+def run_blocking(fn, *args):  # 在系统线程中执行fn并等待结果，等待期间事件循环可以处理其他请求
+    if mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    if mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
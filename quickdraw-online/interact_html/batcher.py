@@ -0,0 +1,109 @@
+import threading
+import time
+import itertools
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from async_mode import run_blocking
+
+class BatchPredictor:  # 动态批处理：收集短时间内多个用户的图像，一次前向传播后分发预测结果
+    # predictor.max_batch_size为单次前向传播的最大图像数
+    # predictor.max_wait为第一个请求到达后最多等待凑批的时间（秒）
+    # 同一个用户（key）在队列中只保留最新的一帧，被新帧替代的请求直接返回None，不做前向传播
+    # model为Model时在后台线程中推理；为workers.InferencePool时异步分发，最多同时有n_workers个batch在推理
+    def __init__(self, model, max_batch_size=32, max_wait=0.005):
+        self.model = model
+        self.slots = threading.Semaphore(getattr(model, 'n_workers', 1))  # 空闲的推理进程数
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = OrderedDict()  # 等待预测的请求 {key: (x, future, 入队时间, 序号)}
+        self.anonymous = itertools.count()  # 没有指定key的请求使用的唯一编号
+        self.cond = threading.Condition()
+        # 统计信息
+        self.batch_hist = {}  # {batch大小: 出现次数}
+        self.latencies = deque(maxlen=1000)  # 最近请求的延迟（秒）
+        self.served = 0
+        self.dropped = 0  # 被更新的帧替代或乱序到达而丢弃的请求数
+        self.thread = threading.Thread(target=self.__loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, x, key=None, seq=0):
+        # 提交一个预处理后的(28,28,1)图像，返回Future，结果为top5表格，被丢弃时结果为None
+        # key为用户id，seq为该用户上传的序号，队列中同一key只保留seq最大的请求
+        future = Future()
+        if key is None: key = ('anonymous', next(self.anonymous))
+        with self.cond:
+            if key in self.queue:
+                _, old_future, _, old_seq = self.queue[key]
+                if seq < old_seq:  # 乱序到达的旧帧
+                    self.dropped += 1
+                    future.set_result(None)
+                    return future
+                self.dropped += 1
+                old_future.set_result(None)
+            self.queue[key] = (x, future, time.perf_counter(), seq)  # 替换时保持原有的排队位置
+            self.cond.notify()
+        return future
+
+    def predict_table(self, x, key=None, seq=0):  # 阻塞等待当前图像的预测结果
+        return self.submit(x, key, seq).result()
+
+    def skip(self):  # 记录一个在提交前就被丢弃的请求
+        with self.cond:
+            self.dropped += 1
+
+    def __collect(self):  # 等待凑齐一个batch，返回其中的请求
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+            deadline = time.perf_counter() + self.max_wait
+            while len(self.queue) < self.max_batch_size:
+                remain = deadline - time.perf_counter()
+                if remain <= 0: break
+                self.cond.wait(remain)
+            n = min(len(self.queue), self.max_batch_size)
+            return [self.queue.popitem(last=False)[1] for _ in range(n)]
+
+    def __loop(self):
+        while True:
+            # 等到有空闲的推理进程后再凑batch，推理繁忙时请求在队列中积累成更大的batch
+            self.slots.acquire()
+            batch = self.__collect()
+            xs = np.stack([x for x, _, _, _ in batch])
+            if hasattr(self.model, 'submit'):
+                self.model.submit(xs).add_done_callback(lambda future, batch=batch: self.__finish(batch, future))
+                continue
+            future = Future()
+            try:
+                future.set_result(run_blocking(self.model.predict_tables, xs))
+            except Exception as e:
+                future.set_exception(e)
+            self.__finish(batch, future)
+
+    def __finish(self, batch, future):  # 将一个batch的预测结果分发给各个请求
+        self.slots.release()
+        try:
+            tables = future.result()
+        except Exception as e:  # 预测失败时将异常传给每个请求，不让后台线程退出
+            for _, request, _, _ in batch:
+                request.set_exception(e)
+            return
+        now = time.perf_counter()
+        with self.cond:
+            self.batch_hist[len(batch)] = self.batch_hist.get(len(batch), 0) + 1
+            for _, _, start, _ in batch:
+                self.latencies.append(now - start)
+            self.served += len(batch)
+        for (_, request, _, _), table in zip(batch, tables):
+            request.set_result(table)
+
+    def stats(self):  # 队列长度、batch大小直方图、请求延迟分位数（毫秒）
+        with self.cond:
+            latencies = np.array(self.latencies) * 1000
+            ret = {'queue_depth': len(self.queue), 'served': self.served, 'dropped': self.dropped,
+                   'batch_hist': dict(sorted(self.batch_hist.items()))}
+        if hasattr(self.model, 'stats'):
+            ret['workers'] = self.model.stats()
+        if len(latencies):
+            ret['latency_ms'] = {f"p{q}": round(float(np.percentile(latencies, q)), 2) for q in (50, 90, 99)}
+        return ret
@@ -0,0 +1,30 @@
+# 对比单张图片推理延迟：keras.Model.predict 与 Model.infer (tf.function)
+# 需在interact_html目录下执行: python benchmark_model.py [--n 500] [--xla]
+import argparse
+import time
+import numpy as np
+from model import Model, tf
+
+def measure(fn, xs):  # 逐个请求计时，返回延迟（毫秒）
+    latencies = []
+    for x in xs:
+        start = time.perf_counter()
+        fn(x)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def report(name, latencies):
+    print(f"{name:>16}: p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms "
+          f"mean={latencies.mean():.2f}ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=500, help="请求次数")
+    parser.add_argument('--xla', action='store_true', help="推理函数使用XLA编译")
+    args = parser.parse_args()
+
+    model = Model('deeper_cnn', xla=args.xla)
+    xs = np.random.rand(args.n, 1, 28, 28, 1).astype(np.float32)
+    model.model.predict(xs[0], verbose=0)  # 预热predict
+    report("model.predict", measure(lambda x: model.model.predict(x, verbose=0), xs))
+    report("tf.function", measure(lambda x: model.infer(tf.convert_to_tensor(x)).numpy(), xs))
@@ -0,0 +1,59 @@
+# 把210个类别的参考图片打包为一张精灵图（sprite sheet）和一个JSON清单，网页只需下载并缓存这一张图片
+# 精灵图每行为一个类别，每列为该类别随机抽取的一张28x28图片，文件名带有内容哈希，可以被浏览器长期缓存
+# 需在interact_html目录下执行: python build_sprites.py [--samples 8] [--seed 0]
+# 生成后重启app.py即可使用，清单不存在或与target_labels不一致时服务器仍使用数据集中的单张图片
+import json
+import hashlib
+import argparse
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from constant import target_labels, PATH_DATASET, PATH_SPRITES, sprite_manifest
+
+def sample_files(path, n, rng):  # 随机抽取n张图片，不足n张时全部使用
+    files = sorted(file.name for file in path.iterdir())
+    if len(files) > n:
+        files = sorted(rng.choice(files, n, replace=False))
+    return files
+
+def build(samples, seed, tile=28):
+    rng = np.random.default_rng(seed)
+    chosen = [sample_files(PATH_DATASET.joinpath(label), samples, rng) for label in target_labels]
+    samples = max(len(files) for files in chosen)  # 数据集图片不足时减少列数
+    sheet = np.zeros((len(target_labels) * tile, samples * tile), dtype=np.uint8)
+    labels = []
+    for row, (label, files) in enumerate(zip(target_labels, chosen)):
+        if not files: raise FileNotFoundError(f"类别{label}下没有图片")
+        for col, name in enumerate(files):
+            img = Image.open(PATH_DATASET.joinpath(label, name)).convert('L')
+            if img.size != (tile, tile): img = img.resize((tile, tile), Image.BILINEAR)
+            sheet[row*tile:(row+1)*tile, col*tile:(col+1)*tile] = np.array(img)
+        labels.append({'label': label, 'row': row, 'count': len(files)})
+    buffer = BytesIO()
+    Image.fromarray(sheet).save(buffer, format='png', optimize=True)
+    data = buffer.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    manifest = {
+        'version': 1,
+        'file': f"reference-{digest[:12]}.png",
+        'sha256': digest,
+        'tileSize': [tile, tile],
+        'grid': [len(target_labels), samples],  # [行数(类别数), 列数(每类最多图片数)]
+        'labels': labels,
+    }
+    return data, manifest
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=8, help="每个类别抽取的图片数")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data, manifest = build(args.samples, args.seed)
+    PATH_SPRITES.mkdir(parents=True, exist_ok=True)
+    for file in PATH_SPRITES.glob("reference-*.png"):  # 删除旧的精灵图
+        file.unlink()
+    PATH_SPRITES.joinpath(manifest['file']).write_bytes(data)
+    PATH_SPRITES.joinpath(sprite_manifest).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"共{len(manifest['labels'])}个类别，每类最多{manifest['grid'][1]}张图片，"
+          f"精灵图{manifest['file']}大小{len(data)/1024:.1f}KB，清单{sprite_manifest}")
@@ -0,0 +1,52 @@
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+
+# 空白画板的预测表格：只有排名，没有类别和置信度（与interact.html中的初始表格一致）
+EMPTY_TABLE = [(rk+1, '', '') for rk in range(5)]
+
+class PredictionCache:  # 以预处理后28x28图像的哈希为键的LRU缓存，撤销、重画出相同图像时不再做前向传播
+    # cache.max_items为最多缓存的表格数，超过时淘汰最久未使用的
+    # cache.ttl为每条缓存的有效时间（秒）
+    def __init__(self, max_items=4096, ttl=600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.items = OrderedDict()  # {哈希: (过期时间, top5表格)}
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.empty = self.evictions = 0
+
+    @staticmethod
+    def key(x):
+        return hashlib.blake2b(x.tobytes(), digest_size=16).digest()
+
+    def get(self, x):  # 返回(键, 表格)，未命中时表格为None
+        if not x.any():  # 空白画板直接返回空表格
+            with self.lock: self.empty += 1
+            return None, EMPTY_TABLE
+        key = self.key(x)
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self.items.move_to_end(key)
+                self.hits += 1
+                return key, item[1]
+            if item is not None:  # 已过期
+                del self.items[key]
+            self.misses += 1
+        return key, None
+
+    def put(self, key, table):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, table)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'size': len(self.items), 'hits': self.hits, 'misses': self.misses,
+                    'empty': self.empty, 'evictions': self.evictions,
+                    'hit_rate': round(self.hits / total, 4) if total else 0}
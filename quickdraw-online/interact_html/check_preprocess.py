@@ -0,0 +1,56 @@
+# 对比preprocess.preprocess_batch与原先基于Keras Resizing的image_reshape_pyramid：
+# 输出的最大误差，以及两者送入模型后top1/top5预测是否一致
+# 需在interact_html目录下执行: python check_preprocess.py [--n 200] [--no-model] [--canvas 画板png所在文件夹]
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageDraw
+from preprocess import preprocess_batch
+
+def random_canvas(rng, size=500):  # 模拟画板：若干条随机折线，255为笔迹（与透明度通道一致）
+    img = Image.new('L', (size, size), 0)
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.integers(1, 8)):
+        points = [tuple(p) for p in rng.integers(20, size - 20, (rng.integers(2, 12), 2))]
+        draw.line(points, fill=255, width=int(rng.integers(10, 31)), joint='curve')
+    return np.array(img)
+
+def load_canvases(path):  # 读取网页画板保存的RGBA图片，取透明度通道
+    return [np.array(Image.open(file))[:,:,3] for file in sorted(Path(path).glob("*.png"))]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200, help="随机生成的画板数")
+    parser.add_argument('--canvas', type=str, default=None, help="使用文件夹中的画板图片代替随机画板")
+    parser.add_argument('--no-model', action='store_true', help="只比较预处理结果，不加载模型")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.canvas is not None:
+        canvases = np.stack(load_canvases(args.canvas))
+    else:
+        canvases = np.stack([random_canvas(rng) for _ in range(args.n)])
+
+    from model import image_reshape_pyramid  # 需要TensorFlow
+    start = time.perf_counter()
+    old = np.stack([np.asarray(image_reshape_pyramid(np.expand_dims(c, -1))) for c in canvases])
+    old_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = preprocess_batch(canvases)
+    new_time = time.perf_counter() - start
+    diff = np.abs(old - new)
+    print(f"画板数{len(canvases)}，最大误差{diff.max():.2e}，平均误差{diff.mean():.2e}")
+    print(f"预处理耗时：Resizing金字塔{old_time*1000:.1f}ms，NumPy批处理{new_time*1000:.1f}ms")
+    if args.no_model: exit()
+
+    from model import Model, tf
+    model = Model('deeper_cnn')
+    pred_old = model.infer(tf.convert_to_tensor(old, dtype=tf.float32)).numpy()
+    pred_new = model.infer(tf.convert_to_tensor(new, dtype=tf.float32)).numpy()
+    top5_old = np.argsort(pred_old, axis=1)[:, ::-1][:, :5]
+    top5_new = np.argsort(pred_new, axis=1)[:, ::-1][:, :5]
+    top1_same = np.mean(top5_old[:, 0] == top5_new[:, 0])
+    top5_same = np.mean([set(a) == set(b) for a, b in zip(top5_old, top5_new)])
+    print(f"top1一致率{top1_same*100:.2f}%，top5集合一致率{top5_same*100:.2f}%，"
+          f"概率最大误差{np.abs(pred_old - pred_new).max():.2e}")
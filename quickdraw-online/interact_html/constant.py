@@ -3,6 +3,8 @@ from pathlib import Path
 import json
 
 PATH_DATASET = Path.cwd().parent.joinpath("dataset_selected")  # 数据集路径
+PATH_SPRITES = Path.cwd().joinpath("static", "sprites")  # 参考图片精灵图路径（由build_sprites.py生成）
+sprite_manifest = "reference-manifest.json"
 
 PATH_ARCHIVES = Path.cwd().parent.joinpath("archives")  # 文档存放路径
 if not PATH_ARCHIVES.exists():
@@ -21,4 +23,22 @@ target_labels = np.array(target_labels)
 
 show_row = 2
 show_column = 5
-show_total = show_row * show_column
\ No newline at end of file
+show_total = show_row * show_column
+
+stroke_canvas_size = 250  # 上传笔画时服务器绘制的中间画板大小（网页画板为500x500）
+stroke_max_canvas = 4096  # 上传笔画时网页画板宽高的上限，超过或不为正数时拒绝
+stroke_max_points = 20000  # 一次上传的笔画总点数上限
+session_max_users = 1000  # 最多同时保存的用户数，超过时淘汰最久未访问的用户
+session_idle_timeout = 2 * 3600  # 用户超过该时间（秒）未访问则被淘汰
+save_img_rate = 0.0  # 用户画板图片抽样保存到static/cache的比例（调试用），0为不保存
+
+model_xla = False  # 推理函数是否使用XLA编译
+inference_workers = 0  # 推理子进程数，0表示在Socket.IO服务器进程中推理
+
+# 动态批处理
+batch_max_size = 32  # 单次前向传播最多的图像数
+batch_max_wait = 0.005  # 第一个请求到达后最多等待凑批的时间（秒）
+
+# 预测结果缓存
+cache_max_items = 4096  # 最多缓存的预测表格数
+cache_ttl = 600  # 每条缓存的有效时间（秒）
@@ -0,0 +1,82 @@
+# Socket.IO压力测试：模拟大量学生同时在线绘画，统计建立连接和返回预测结果的延迟
+# 先启动服务器（例如 python app.py --async-mode eventlet），再执行:
+# python loadtest.py --url http://127.0.0.1:5000 --clients 300 --uploads 20
+# 需要安装客户端依赖: pip install "python-socketio[client]" requests
+import time
+import argparse
+import threading
+import numpy as np
+import requests
+import socketio
+
+def random_strokes(rng, n_strokes):  # 随机生成QuickDraw格式的笔画
+    strokes = []
+    for _ in range(n_strokes):
+        n = int(rng.integers(2, 30))
+        strokes.append([rng.integers(20, 480, n).tolist(), rng.integers(20, 480, n).tolist()])
+    return strokes
+
+class Student(threading.Thread):  # 一个模拟用户：进入页面，连接Socket.IO，逐笔上传并等待预测结果
+    def __init__(self, url, uploads, think, seed):
+        super().__init__(daemon=True)
+        self.url, self.uploads, self.think = url, uploads, think
+        self.rng = np.random.default_rng(seed)
+        self.connect_latency = None
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            response = requests.post(self.url + '/', allow_redirects=False, timeout=30)
+            id = response.headers['Location'].rstrip('/').split('/')[-1]
+            sio = socketio.Client(reconnection=False)
+            reply = threading.Event()
+            sio.on('update_data', lambda data: reply.set())
+            sio.connect(self.url, transports=['websocket'], wait_timeout=30)
+            self.connect_latency = time.perf_counter() - start
+        except Exception:
+            self.errors += 1
+            return
+        strokes = random_strokes(self.rng, self.uploads)
+        for seq in range(1, self.uploads + 1):
+            time.sleep(self.rng.exponential(self.think))  # 画下一笔的时间
+            reply.clear()
+            start = time.perf_counter()
+            sio.emit('upload_strokes', {'id': id, 'seq': seq, 'strokes': strokes[:seq],
+                                        'sizes': [20] * seq, 'width': 500, 'height': 500})
+            if reply.wait(timeout=30):
+                self.latencies.append(time.perf_counter() - start)
+            else: self.errors += 1
+        sio.disconnect()
+
+def report(name, latencies):
+    latencies = np.array(latencies) * 1000
+    if len(latencies) == 0:
+        print(f"{name}: 无数据"); return
+    print(f"{name}: n={len(latencies)} p50={np.percentile(latencies, 50):.1f}ms "
+          f"p90={np.percentile(latencies, 90):.1f}ms p99={np.percentile(latencies, 99):.1f}ms max={latencies.max():.1f}ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=100, help="同时在线的模拟用户数")
+    parser.add_argument('--uploads', type=int, default=20, help="每个用户上传的次数（笔画数）")
+    parser.add_argument('--think', type=float, default=1.0, help="两次上传之间的平均间隔（秒）")
+    parser.add_argument('--ramp', type=float, default=5.0, help="在多少秒内逐渐加入全部用户")
+    args = parser.parse_args()
+
+    students = [Student(args.url, args.uploads, args.think, seed) for seed in range(args.clients)]
+    start = time.perf_counter()
+    for student in students:
+        student.start()
+        time.sleep(args.ramp / args.clients)
+    for student in students: student.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [l for s in students for l in s.latencies]
+    report("建立连接", [s.connect_latency for s in students if s.connect_latency is not None])
+    report("预测延迟", latencies)
+    print(f"用户数{args.clients}，错误{sum(s.errors for s in students)}次，"
+          f"总耗时{elapsed:.1f}s，吞吐量{len(latencies)/elapsed:.1f}次预测/秒")
+    print("服务器统计:", requests.get(args.url + '/stats/', timeout=30).json())
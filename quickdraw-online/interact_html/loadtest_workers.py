@@ -0,0 +1,32 @@
+# 推理子进程数量与吞吐量的关系：对1..N个子进程分别持续提交batch，统计每秒处理的图像数
+# 需在interact_html目录下执行: python loadtest_workers.py [--max-workers 4] [--batch 8] [--batches 200]
+import os
+import time
+import argparse
+import numpy as np
+from workers import InferencePool
+
+def run(n_workers, batch_size, n_batches):
+    pool = InferencePool('deeper_cnn', n_workers)
+    xs = np.random.rand(batch_size, 28, 28, 1).astype(np.float32)
+    # 预热：等待所有子进程加载完模型
+    for future in [pool.submit(xs) for _ in range(n_workers * 2)]: future.result()
+    start = time.perf_counter()
+    futures = [pool.submit(xs) for _ in range(n_batches)]
+    for future in futures: future.result()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return n_batches * batch_size / elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help="最多的子进程数")
+    parser.add_argument('--batch', type=int, default=8, help="每个batch的图像数")
+    parser.add_argument('--batches', type=int, default=200, help="每轮提交的batch数")
+    args = parser.parse_args()
+
+    base = None
+    for n in range(1, args.max_workers + 1):
+        throughput = run(n, args.batch, args.batches)
+        base = base or throughput
+        print(f"子进程数{n:2}: {throughput:8.1f} 图像/秒，加速比{throughput/base:.2f}")
@@ -3,10 +3,17 @@ import base64
 from io import BytesIO
 import numpy as np
 from pathlib import Path
-from constant import target_labels, eng_to_chn, PATH_DATASET, show_total, show_column
-import shutil
+from constant import target_labels, eng_to_chn, show_total, show_column, save_img_rate
+from constant import session_max_users, session_idle_timeout
+from rasterize import rasterize_strokes
+from reference import load_reference
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+import time
 PATH_CACHE = Path("./static/cache")
 PATH_CACHE.mkdir(parents=True, exist_ok=True)
+saver = ThreadPoolExecutor(max_workers=1)  # 后台保存调试用的画板图片、删除用户缓存，不占用预测的时间
 
 def clean_cache(path):
     if not path.exists(): return
@@ -19,17 +26,51 @@ def clean_cache(path):
             else: clean_cache(file)
         path.rmdir()
 
-class Manager:
-    def __init__(self):
+class Manager:  # 用户会话管理，超过空闲时间或用户数上限时淘汰最久未访问的用户，并删除其缓存文件夹
+    # manager.users按最近访问时间排序，最久未访问的在最前面，所以淘汰只需检查开头的用户
+    def __init__(self, max_users=session_max_users, idle_timeout=session_idle_timeout):
+        self.max_users = max_users
+        self.idle_timeout = idle_timeout
         self.count = 0
-        self.users = []
+        self.evicted = 0
+        self.users = OrderedDict()  # {id: User}
+        self.lock = threading.Lock()
+        self.reference = load_reference()  # 所有用户共用的参考图片索引
+
     def add(self):
-        self.users.append(User(self.count))
-        self.count += 1
-        return self.users[-1]
-    def get_user(self, id):
-        if id >= self.count: return False
-        return self.users[id]
+        with self.lock:
+            id = self.count
+            self.count += 1
+        user = User(id, self.reference)
+        with self.lock:
+            self.users[id] = user
+            self.evict()
+        return user
+
+    def get_user(self, id):  # 用户不存在或已被淘汰时返回False
+        with self.lock:
+            user = self.users.get(id)
+            if user is None: return False
+            user.last_active = time.monotonic()
+            self.users.move_to_end(id)
+            self.evict()
+        return user
+
+    def evict(self):  # 需在持有self.lock时调用
+        now = time.monotonic()
+        while self.users:
+            user = next(iter(self.users.values()))
+            if len(self.users) <= self.max_users and now - user.last_active <= self.idle_timeout: break
+            self.users.popitem(last=False)
+            self.evicted += 1
+            saver.submit(clean_cache, user.dir_path)
+
+    def stats(self):  # 在线用户数、累计创建和淘汰的用户数、用户画板图片占用的内存
+        with self.lock:
+            self.evict()
+            img_bytes = sum(user.img.nbytes for user in self.users.values() if user.img is not None)
+            return {'sessions': len(self.users), 'created': self.count, 'evicted': self.evicted,
+                    'img_bytes': img_bytes}
 
 def convert_form_to_image(image_data):
     base64_data = image_data.split(',')[1]
@@ -37,64 +78,54 @@ def convert_form_to_image(image_data):
     image = Image.open(BytesIO(decoded_data))
     # 图片为RGBA格式，由于是黑白图片，只有第三个维度不为0
     # 0为透明，而255为不透明，所以后续也不用翻转值域
-    image = np.array(image)[:,:,3]
+    image = np.array(image.getchannel('A'))
     return image
 
+def save_img(img, path):
+    # Image读取灰度图像不能有第三个维度
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(img).save(path)
+
 class User:
-    def __init__(self, id):
+    def __init__(self, id, reference):
         self.id = id
+        self.reference = reference
         self.count = 0
-        self.dir_path = PATH_CACHE.joinpath(f"{self.id:04}")
-        self.dir_path.mkdir(parents=True, exist_ok=True)
+        self.epoch = None  # 最近一次上传的网页标识
+        self.seq = 0  # 最近一次收到的上传序号
+        self.last_active = time.monotonic()
+        self.dir_path = PATH_CACHE.joinpath(f"{self.id:04}")  # 只有抽样保存画板图片时才创建
         self.get_table()
         self.img = None
-        self.img_path = None
 
-    def get_paths(self):
-        self.relative_paths = []
-        dir_show_path = self.dir_path.joinpath("show")
-        clean_cache(dir_show_path)
-        dir_show_path.mkdir(parents=True, exist_ok=True)
-        for label in self.show_labels:
-            path = PATH_DATASET.joinpath(label)
-            files = list(path.iterdir())
-            file = np.random.choice(files)
-            show_path = dir_show_path.joinpath(label+'_'+file.name).absolute()
-            # print(file, show_path)
-            relative_path = str(show_path)[str(show_path).find("static")-1:]
-            # print(relative_path)
-            self.relative_paths.append(relative_path)
-            shutil.copy(file, show_path)
-    
-    def get_table(self):  # 更新为用户显示的图像索引及对应的缓存位置
+    def reset_seq(self):
+        self.epoch, self.seq = None, 0
+
+    def get_table(self):  # 更新为用户显示的参考图片，表格每项为(英文标签, 中文标签, 图片url或在精灵图中的位置)
         self.show_labels = np.random.choice(target_labels, show_total)
-        self.get_paths()
         self.table, row = [], []
-        for idx, (label, path) in enumerate(zip(self.show_labels, self.relative_paths)):
-            row.append((label, eng_to_chn[label], path))
+        for idx, label in enumerate(self.show_labels):
+            row.append((label, eng_to_chn[label], self.reference.choose(label)))
             if (idx + 1) % show_column == 0:
                 self.table.append(row)
                 row = []
     
-    def get_relative_path(self):  # 获取相对于static/的路径
-        s = str(self.img_path.absolute()).split('/')
-        return '/'.join(s[-3:])
-
-    def remove_img(self):
-        if self.img_path is not None and self.img_path.exists():
-            self.img_path.unlink()
-
-    def save_img(self):
-        # Image读取灰度图像不能有第三个维度
-        Image.fromarray(self.img).save(self.img_path)
-
     def update_img(self, image_data):
-        # 图片读取与保存，并删除旧图片
-        self.remove_img()
+        # 画板图片只以数组形式保存在内存中，按save_img_rate抽样在后台写入缓存文件夹便于调试
         self.count += 1
         self.img = convert_form_to_image(image_data)
-        self.img_path = self.dir_path.joinpath(f"img{self.count:04}.png")
-        self.save_img()
+        self.sample_save()
+        return self.img
+
+    def update_strokes(self, strokes, sizes, width, height):  # 由上传的笔画坐标绘制图片
+        self.count += 1
+        self.img = rasterize_strokes(strokes, sizes, width, height)
+        self.sample_save()
+        return self.img
+
+    def sample_save(self):
+        if save_img_rate > 0 and np.random.rand() < save_img_rate:
+            saver.submit(save_img, self.img, self.dir_path.joinpath(f"img{self.count:04}.png"))
 
     def test_table(self):
         table_data = [
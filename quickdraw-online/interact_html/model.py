@@ -1,10 +1,12 @@
 import numpy as np
 from model_loader.load_cnn_model import *
 from model_loader.load_deeper_cnn_model import *
-from constant import target_labels, eng_to_chn
+from preprocess import preprocess
+from constant import target_labels, eng_to_chn, model_xla
 import matplotlib.pyplot as plt
 
 # 利用高斯金字塔将img图像从500x500下采样到28x28像素
+# 每次调用都会新建Resizing层，线上已改用preprocess.preprocess_batch，这里保留作为对照实现
 def image_reshape_pyramid(img, x=28, y=28):
     def image_sample_half(img, times):
         if times == 0: return img
@@ -19,23 +21,46 @@ def image_reshape_pyramid(img, x=28, y=28):
     img = img / np.max(img)
     return img
 
+def get_top5_table(pred):  # 由210维预测概率得到top5的(排名, 类别, 置信度)表格
+    top5_idxs = np.argsort(pred)[::-1][:5]
+    top5_labels = target_labels[top5_idxs]
+    top5_table = []
+    for rk, (label, p) in enumerate(zip(top5_labels, pred[top5_idxs])):
+        top5_table.append((rk+1, label+' '+eng_to_chn[label], str(np.round(p*100,2))+"%"))
+    return top5_table
+
+def strip_augmentation(model):  # 去掉输入后的数据增强层，构建只用于推理的网络（与model共享权重）
+    inputs = layers.Input(shape=model.input_shape[1:], name='img')
+    x = inputs
+    for layer in model.layers:
+        if isinstance(layer, layers.InputLayer) or layer.name == 'augmentation': continue
+        x = layer(x)
+    return keras.Model(inputs, x)
+
 class Model:
-    def __init__(self, name):
+    def __init__(self, name, xla=model_xla):
         if name == 'cnn':
             self.model = load_cnn_model()
         elif name == 'deeper_cnn':
             self.model = load_deeper_cnn_model()
+        # keras.Model.predict每次调用都会重建数据适配器，对单张图片开销远大于前向传播本身，
+        # 所以在初始化时构建固定输入签名的tf.function并直接调用
+        self.net = strip_augmentation(self.model)
+        self.infer = tf.function(lambda x: self.net(x, training=False),
+                                 input_signature=[tf.TensorSpec((None, 28, 28, 1), tf.float32)],
+                                 jit_compile=xla)
+        self.infer(tf.zeros((1, 28, 28, 1)))  # 预热，完成trace（和XLA编译）
+
+    def preprocess(self, x):  # 将画板的透明度通道转为模型输入(28,28,1)
+        return preprocess(x)
+
+    def predict_tables(self, xs):  # 对一个batch的预处理后图像xs(N,28,28,1)做一次前向传播，返回每个图像的top5表格
+        preds = self.infer(tf.convert_to_tensor(xs, dtype=tf.float32)).numpy()
+        return [get_top5_table(pred) for pred in preds]
+
     def predict_table(self, x):
-        x = np.expand_dims(x, axis=-1)
-        x = image_reshape_pyramid(x)
-        x = np.expand_dims(x, axis=0)
-        # plt.imshow(x[0])
+        x = self.preprocess(x)
+        # plt.imshow(x)
         # plt.savefig("fig.png")
         # plt.close()
-        pred = self.model.predict(x, verbose=0)[0]
-        top5_idxs = np.argsort(pred)[::-1][:5]
-        top5_labels = target_labels[top5_idxs]
-        top5_table = []
-        for rk, (label, pred) in enumerate(zip(top5_labels, pred[top5_idxs])):
-            top5_table.append((rk+1, label+' '+eng_to_chn[label], str(np.round(pred*100,2))+"%"))
-        return top5_table
\ No newline at end of file
+        return self.predict_tables(np.expand_dims(x, axis=0))[0]
@@ -0,0 +1,43 @@
+import numpy as np
+from functools import lru_cache
+
+# 纯NumPy实现的下采样预处理，结果与model.image_reshape_pyramid一致（浮点误差内）
+# 金字塔中每一步都是双线性插值（half pixel centers，同tf.image.resize），是线性变换，
+# 所以整条金字塔在每个轴上可以合成为一个(28, 原尺寸)的矩阵，预处理只需要两次矩阵乘法
+
+@lru_cache(maxsize=None)
+def resize_matrix(in_size, out_size):  # 一维双线性插值矩阵(out_size, in_size)
+    scale = in_size / out_size
+    out = np.arange(out_size)
+    pos = (out + 0.5) * scale - 0.5
+    floor = np.floor(pos)
+    lower = np.maximum(floor, 0).astype(int)
+    upper = np.minimum(np.ceil(pos), in_size - 1).astype(int)
+    lerp = pos - floor
+    mat = np.zeros((out_size, in_size), dtype=np.float64)
+    np.add.at(mat, (out, lower), 1 - lerp)
+    np.add.at(mat, (out, upper), lerp)
+    return mat
+
+@lru_cache(maxsize=None)
+def pyramid_matrix(in_size, out_size, power):  # 先减半power次再插值到out_size的合成矩阵
+    mat = np.eye(in_size)
+    size = in_size
+    for _ in range(power):
+        mat = resize_matrix(size, size // 2) @ mat
+        size //= 2
+    return (resize_matrix(size, out_size) @ mat).astype(np.float32)
+
+def preprocess_batch(imgs, x=28, y=28):  # imgs为(N,H,W)的透明度通道，返回模型输入(N,x,y,1)
+    imgs = np.asarray(imgs, dtype=np.float32)
+    h, w = imgs.shape[1:3]
+    power = min(int(np.log2(h / x)), int(np.log2(w / y)))
+    out = pyramid_matrix(h, x, power) @ imgs @ pyramid_matrix(w, y, power).T
+    out = np.log1p(np.maximum(out, 0))  # 消除矩阵乘法带来的微小负数
+    peak = out.max(axis=(1, 2), keepdims=True)
+    # 空白画板最大值为0，原实现会得到nan，这里保持为全0
+    out = np.divide(out, peak, out=np.zeros_like(out), where=peak > 0)
+    return out[..., np.newaxis]
+
+def preprocess(img):  # 单张画板(H,W)的预处理，返回(28,28,1)
+    return preprocess_batch(img[np.newaxis])[0]
@@ -0,0 +1,42 @@
+import math
+import numpy as np
+from PIL import Image, ImageDraw
+from constant import stroke_canvas_size, stroke_max_canvas, stroke_max_points
+
+# 将网页上传的笔画坐标直接绘制为小尺寸灰度图，代替解码整张500x500的PNG
+# 笔画格式与QuickDraw原始数据一致：strokes = [[[x0, x1, ...], [y0, y1, ...]], ...]
+# PIL绘制的线条没有抗锯齿，所以先画在stroke_canvas_size的中间尺寸上，
+# 再由preprocess中的金字塔下采样平均得到平滑的28x28图像
+
+def parse_strokes(strokes, sizes, width, height):
+    # 检查网页上传的笔画数据，全部转换为浮点数后返回(strokes, sizes, width, height)
+    # 格式错误、含有非有限数值、画板尺寸不为正数或过大、点数过多时返回None
+    try:
+        width, height = float(width), float(height)
+        if not (0 < width <= stroke_max_canvas and 0 < height <= stroke_max_canvas): return None
+        if not isinstance(strokes, list) or not isinstance(sizes, list) or len(strokes) != len(sizes): return None
+        parsed, n_points = [], 0
+        for (xs, ys), line_width in zip(strokes, sizes):
+            if not isinstance(xs, list) or not isinstance(ys, list) or len(xs) != len(ys): return None
+            n_points += len(xs)
+            if n_points > stroke_max_points: return None
+            xs, ys = [float(x) for x in xs], [float(y) for y in ys]
+            if not all(map(math.isfinite, xs + ys)): return None
+            parsed.append((xs, ys))
+        sizes = [float(line_width) for line_width in sizes]
+        if not all(0 < line_width <= max(width, height) for line_width in sizes): return None
+    except (TypeError, ValueError):
+        return None
+    return parsed, sizes, width, height
+
+def rasterize_strokes(strokes, sizes, width, height, size=stroke_canvas_size):
+    # sizes为每一笔的画笔粗细，width和height为网页画板大小，返回(size,size)的uint8数组，笔迹为255
+    # 参数需先经过parse_strokes检查
+    scale = size / max(width, height)
+    img = Image.new('L', (size, size), 0)
+    draw = ImageDraw.Draw(img)
+    for (xs, ys), line_width in zip(strokes, sizes):
+        if len(xs) < 2: continue  # 画板上只点击不移动不会留下笔迹
+        points = [(x * scale, y * scale) for x, y in zip(xs, ys)]
+        draw.line(points, fill=255, width=max(1, round(float(line_width) * scale)), joint='curve')
+    return np.array(img)
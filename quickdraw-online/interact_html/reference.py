@@ -0,0 +1,54 @@
+import json
+import numpy as np
+from urllib.parse import quote
+from constant import target_labels, PATH_DATASET, PATH_SPRITES, sprite_manifest
+
+def load_reference():  # 存在与target_labels一致的精灵图清单时使用精灵图，否则使用数据集中的单张图片
+    path = PATH_SPRITES.joinpath(sprite_manifest)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if [item['label'] for item in manifest['labels']] == list(target_labels) \
+                and PATH_SPRITES.joinpath(manifest['file']).exists():
+            return SpriteIndex(manifest)
+        print(f"精灵图清单{path}与target_labels不一致，请重新执行build_sprites.py")
+    return ReferenceIndex()
+
+class ReferenceIndex:  # 参考图片索引，服务器启动时遍历一次数据集，之后随机选取图片不再访问磁盘目录
+    # index.files = {label: 该类别下全部图片文件名的数组}
+    # 图片通过/reference/<label>/<name>直接从数据集文件夹读取，不再复制到每个用户的缓存文件夹
+    sprite = None
+    def __init__(self, path=PATH_DATASET, labels=target_labels):
+        self.path = path
+        self.files = {}
+        for label in labels:
+            self.files[label] = np.array(sorted(file.name for file in path.joinpath(label).iterdir()))
+
+    def choose(self, label):  # 随机选取label中的一张图片，返回其url
+        names = self.files[label]
+        name = names[np.random.randint(len(names))]
+        return f"/reference/{quote(label)}/{quote(name)}"
+
+    def exists(self, label, name):
+        names = self.files.get(label)
+        if names is None: return False
+        idx = np.searchsorted(names, name)  # 文件名已排序，二分查找
+        return idx < len(names) and names[idx] == name
+
+class SpriteIndex:  # 精灵图索引，全部参考图片在一张图片中，choose返回图片在精灵图中的CSS背景位置
+    # 网页中每个单元格以精灵图为背景，background-size放大为行列数倍，再用background-position显示对应的一格
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.rows, self.columns = manifest['grid']
+        self.counts = {item['label']: (item['row'], item['count']) for item in manifest['labels']}
+        self.sprite = {'url': f"/sprites/{manifest['file']}", 'rows': self.rows, 'columns': self.columns}
+
+    def choose(self, label):
+        row, count = self.counts[label]
+        col = np.random.randint(count)
+        x = col / (self.columns - 1) * 100 if self.columns > 1 else 0
+        y = row / (self.rows - 1) * 100 if self.rows > 1 else 0
+        return f"{x:.4f}% {y:.4f}%"
+
+    def exists(self, label, name):  # 精灵图模式下不提供单张图片
+        return False
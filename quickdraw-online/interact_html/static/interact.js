@@ -21,6 +21,10 @@ var statusArr = []
 statusArr[0]=ctx.getImageData(0, 0, canvas.width, canvas.height)
 //总是指向当前状态
 var statusIndex=0
+//笔画坐标列表（QuickDraw格式，每一笔为[[x...], [y...]]），与状态列表一一对应
+var strokes = []
+var sizes = []
+var currentStroke = null
 //状态添加
 function addStatus() {
     let imageData = ctx.getImageData(0, 0, canvas.width, canvas.height)
@@ -39,7 +43,14 @@ function draw(x, y) {
 }
 // 接收功能
 var socket = io.connect('https://' + document.domain + ':' + location.port);
+//每次上传的序号，只显示比当前已显示结果更新的预测
+//epoch为每次打开网页时生成的随机标识，服务器据此区分刷新前后或不同标签页的序号
+var epoch = Date.now().toString(36) + Math.random().toString(36).slice(2)
+var seq = 0
+var shownSeq = 0
 socket.on('update_data', function(data) {
+    if (data.seq < shownSeq) return
+    shownSeq = data.seq
     // 更新图片
     // var imgElement = document.querySelector('.fast_show img');
     // imgElement.src = data.image_url;
@@ -59,13 +70,36 @@ socket.on('update_data', function(data) {
     });
 });
 
-//上传功能
+//长时间未使用，服务器已删除当前用户，回到首页重新进入
+socket.on('expired', function() {
+    window.location.href = '/'
+});
+
+//上传功能，只上传笔画坐标，服务器端重新绘制
 function uploadImage() {
-    console.log("上传图片")
-    var image_data = canvas.toDataURL();
+    console.log("上传笔画")
     // 从当前网址中提取 id 值
     var id = window.location.pathname.split('/').pop();
-    socket.emit('upload_image', { image_data: image_data, id: id });
+    seq++
+    socket.emit('upload_strokes', { strokes: strokes, sizes: sizes,
+        width: canvas.width, height: canvas.height, id: id, epoch: epoch, seq: seq });
+}
+//连续的抬笔、撤销操作只在停顿uploadDelay毫秒后上传一次
+var uploadDelay = 100
+var uploadTimer = null
+function scheduleUpload() {
+    clearTimeout(uploadTimer)
+    uploadTimer = setTimeout(uploadImage, uploadDelay)
+}
+//记录笔画坐标，距离上一个点不足2像素的点不记录
+function addPoint(x, y) {
+    x = Math.round(x)
+    y = Math.round(y)
+    let xs = currentStroke[0], ys = currentStroke[1]
+    let last = xs.length - 1
+    if (last >= 0 && Math.abs(x - xs[last]) < 2 && Math.abs(y - ys[last]) < 2) return
+    xs.push(x)
+    ys.push(y)
 }
 // 获取 Canvas 元素的相对位置和尺寸信息
 var canvasRect = canvas.getBoundingClientRect();
@@ -75,21 +109,26 @@ var canvasY = canvasRect.top;
 canvas.onmousedown = (e) => {
     isDraw = true
     draw(e.x-canvasX, e.y-canvasY)
+    currentStroke = [[], []]
+    addPoint(e.x-canvasX, e.y-canvasY)
 }
 //移动绘画
 canvas.onmousemove = (e) => {
     if (isDraw) {
         ctx.lineTo(e.x-canvasX, e.y-canvasY)
         ctx.stroke()
+        addPoint(e.x-canvasX, e.y-canvasY)
     }
 }
 //停止绘画
 canvas.onmouseup = () => {
     isDraw = false
     ctx.closePath()
+    strokes.push(currentStroke || [[], []])
+    sizes.push(Number(props.size))
+    currentStroke = null
     addStatus()
-    let src = canvas.toDataURL("image/png")
-    uploadImage()
+    scheduleUpload()
 }
 //撤销
 reback.onclick = () => {
@@ -98,7 +137,9 @@ reback.onclick = () => {
     }
     let imageData = statusArr[statusIndex]
     ctx.putImageData(imageData,0,0)
-    uploadImage()
+    strokes.length = statusIndex
+    sizes.length = statusIndex
+    scheduleUpload()
 }
 //清空画布
 clear.onclick = ()=>{
@@ -107,6 +148,9 @@ clear.onclick = ()=>{
     statusArr=[]
     statusArr[0]=ctx.getImageData(0, 0, canvas.width, canvas.height)
     statusIndex=0
+    strokes = []
+    sizes = []
+    scheduleUpload()  // 空白画板由服务器直接返回空表格
 }
 
 // 根据网页中的刷新按钮，刷新show图片
@@ -132,9 +176,17 @@ socket.on('update_show', function(data) {
                 td.appendChild(element)
                 td.appendChild(document.createElement('br'))
             });
-            var urlElement = document.createElement('img');
-            urlElement.src = cell[2];
-            td.appendChild(urlElement)
+            //精灵图模式下cell[2]为图片在精灵图中的位置，否则为图片url
+            if (tableElement.classList.contains('sprite-table')) {
+                var spriteElement = document.createElement('div');
+                spriteElement.className = 'sprite';
+                spriteElement.style.backgroundPosition = cell[2];
+                td.appendChild(spriteElement)
+            } else {
+                var urlElement = document.createElement('img');
+                urlElement.src = cell[2];
+                td.appendChild(urlElement)
+            }
             // cell.forEach(function(param){
             //     var span = document.createElement('span');
             //     span.textContent = param;
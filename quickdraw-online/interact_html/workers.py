@@ -0,0 +1,110 @@
+import os
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from concurrent.futures import Future
+
+# 推理子进程：每个子进程各自加载一个Model，主进程（Socket.IO服务器）只负责分发请求，
+# 前向传播不再阻塞心跳和其他事件的处理
+# 每个子进程的结果通过各自的管道返回：若多个子进程共用一个Queue，子进程在写入时崩溃会使Queue的锁无法释放
+MAX_RETRY = 2  # 一个batch最多因子进程崩溃而重试的次数
+
+def worker_main(name, threads, requests, conn):  # 子进程入口
+    import tensorflow as tf
+    # 多个子进程共享CPU，限制每个进程的线程数避免相互抢占
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from model import Model
+    model = Model(name)
+    while True:
+        item = requests.get()
+        if item is None: break
+        task_id, xs = item
+        try:
+            conn.send((task_id, model.predict_tables(xs), None))
+        except Exception as e:
+            conn.send((task_id, None, repr(e)))
+
+class Worker:  # 一个推理子进程及其请求队列、结果管道、正在处理的任务
+    def __init__(self, ctx, name, threads):
+        self.requests = ctx.Queue()
+        self.conn, child_conn = ctx.Pipe(duplex=False)
+        self.inflight = {}  # {task_id: (xs, future, 重试次数)}
+        self.process = ctx.Process(target=worker_main, args=(name, threads, self.requests, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+class InferencePool:  # 多进程推理池，接口与Model.predict_tables一致，另外提供异步的submit
+    def __init__(self, name, n_workers):
+        self.name = name
+        self.n_workers = n_workers
+        self.threads = max(1, (os.cpu_count() or 1) // n_workers)
+        self.ctx = mp.get_context('spawn')  # 不fork已加载的TensorFlow
+        self.lock = threading.Lock()
+        self.task_ids = itertools.count()
+        self.restarts = 0
+        self.workers = [self.__new_worker() for _ in range(n_workers)]
+        self.closed = False
+        self.thread = threading.Thread(target=self.__collect, daemon=True)
+        self.thread.start()
+
+    def __new_worker(self):
+        return Worker(self.ctx, self.name, self.threads)
+
+    def __send(self, worker, task_id, xs, future, retry):
+        worker.inflight[task_id] = (xs, future, retry)
+        worker.requests.put((task_id, xs))
+
+    def submit(self, xs):  # 将一个batch交给当前任务最少的子进程，返回Future，结果为top5表格列表
+        future = Future()
+        with self.lock:
+            worker = min(self.workers, key=lambda w: len(w.inflight))
+            self.__send(worker, next(self.task_ids), xs, future, 0)
+        return future
+
+    def predict_tables(self, xs):
+        return self.submit(xs).result()
+
+    def __collect(self):  # 后台线程：接收子进程的结果，并检查子进程是否崩溃
+        while not self.closed:
+            with self.lock:
+                conns = {worker.conn: worker for worker in self.workers}
+            for conn in wait(list(conns), timeout=0.5):
+                worker = conns[conn]
+                try:
+                    task_id, tables, error = conn.recv()
+                except (EOFError, OSError):  # 子进程已退出，由__check_workers处理
+                    continue
+                with self.lock:
+                    if task_id not in worker.inflight: continue
+                    _, future, _ = worker.inflight.pop(task_id)
+                if error is None: future.set_result(tables)
+                else: future.set_exception(RuntimeError(error))
+            self.__check_workers()
+
+    def __check_workers(self):  # 重启崩溃的子进程，并把其未完成的任务重新分发
+        with self.lock:
+            for idx, worker in enumerate(self.workers):
+                if self.closed or worker.process.is_alive(): continue
+                print(f"推理子进程{worker.process.pid}退出(exitcode={worker.process.exitcode})，正在重启")
+                self.restarts += 1
+                worker.conn.close()
+                self.workers[idx] = self.__new_worker()
+                for task_id, (xs, future, retry) in worker.inflight.items():
+                    if retry >= MAX_RETRY:
+                        future.set_exception(RuntimeError(f"推理子进程连续{retry+1}次崩溃"))
+                    else:
+                        self.__send(self.workers[idx], task_id, xs, future, retry + 1)
+
+    def close(self):  # 通知所有子进程退出
+        self.closed = True
+        for worker in self.workers:
+            worker.requests.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+
+    def stats(self):
+        with self.lock:
+            return {'workers': self.n_workers, 'restarts': self.restarts,
+                    'inflight': [len(w.inflight) for w in self.workers]}
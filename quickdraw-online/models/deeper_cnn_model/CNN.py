@@ -2,22 +2,30 @@ import numpy as np
 import tensorflow as tf
 from pathlib import Path
 from utils import test_augmentation
-from constant import target_labels, PATH_DATASET
+from packed import packed_datasets
+from tfrecords import tfrecord_datasets
+from throughput import Throughput, profile_pipeline
+from constant import target_labels, PATH_DATASET, PATH_PACKED, PATH_TFRECORDS
 
 keras = tf.keras
 layers = keras.layers
 BATCH_SIZE = 48
 
-ds_train, ds_val = tf.keras.utils.image_dataset_from_directory(
-    directory=PATH_DATASET,
-    class_names=target_labels,
-    color_mode='grayscale',
-    batch_size=BATCH_SIZE,
-    validation_split=0.2,
-    image_size=(28,28),
-    subset='both',
-    seed=42
-)
+if PATH_TFRECORDS.joinpath("manifest.json").exists():  # 优先使用tfrecords.py写出的分片TFRecord
+    ds_train, ds_val = tfrecord_datasets(BATCH_SIZE, PATH_TFRECORDS, seed=42)
+elif PATH_PACKED.joinpath("manifest.json").exists():  # 其次使用packed.py打包后的数据集
+    ds_train, ds_val = packed_datasets(BATCH_SIZE, PATH_PACKED, seed=42)
+else:
+    ds_train, ds_val = tf.keras.utils.image_dataset_from_directory(
+        directory=PATH_DATASET,
+        class_names=target_labels,
+        color_mode='grayscale',
+        batch_size=BATCH_SIZE,
+        validation_split=0.2,
+        image_size=(28,28),
+        subset='both',
+        seed=42
+    )
 
 def convert_data(x, y):
     x = x / 255.
@@ -92,4 +100,6 @@ cp_callback = tf.keras.callbacks.ModelCheckpoint(
     verbose=1, 
     save_weights_only=True)
 
-model.fit(ds_train, epochs=100, validation_data=ds_val, callbacks=[tensorboard_callback, cp_callback])
\ No newline at end of file
+# profile_pipeline(model, ds_train)  # 比较输入管道与训练步骤的吞吐量，判断训练受限于输入还是计算
+
+model.fit(ds_train, epochs=100, validation_data=ds_val, callbacks=[tensorboard_callback, cp_callback, Throughput(BATCH_SIZE)])
\ No newline at end of file
@@ -2,8 +2,10 @@ from pathlib import Path
 import json
 
 PATH_DATASET = Path(r"C:\Coding\xjtu_quick_draw\dataset_selected")  # 数据集
+PATH_PACKED = PATH_DATASET.parent.joinpath("dataset_packed")  # packed.py打包后的数据集
+PATH_TFRECORDS = PATH_DATASET.parent.joinpath("dataset_tfrecords")  # tfrecords.py写出的分片TFRecord数据集
 
-PATH_ARCHIVES = Path(__file__).parent.parent.joinpath("archives")  # 文档存放路径
+PATH_ARCHIVES = Path(__file__).parent.parent.parent.joinpath("archives")  # 文档存放路径
 if not PATH_ARCHIVES.exists():
     raise BaseException(f"文件夹{PATH_ARCHIVES}不存在")
 
@@ -0,0 +1,104 @@
+# 将筛选后的数据集（dataset_selected/<label>/<id>.png）打包为一个uint8图像数组、一个标签数组和一个JSON清单，
+# 训练时直接内存映射读取，不用每个epoch重新打开和解码几万张PNG图片
+# 打包时按类别分层、用固定的随机种子划分训练集和验证集，训练集在前、验证集在后
+# 用法: python packed.py [--src 数据集路径] [--dst 输出路径] [--val-split 0.2] [--seed 42]
+import json
+import argparse
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from PIL import Image
+from constant import target_labels, PATH_DATASET, PATH_PACKED
+
+def list_samples(src):  # [(图片路径, 类别编号), ...]，按类别、文件名排序保证每次结果相同
+    samples = []
+    for label_id, label in enumerate(target_labels):
+        files = sorted(src.joinpath(label).glob("*.png"), key=lambda path: (len(path.stem), path.stem))
+        samples += [(path, label_id) for path in files]
+    return samples
+
+def split_samples(samples, val_split, seed):  # 按类别分层划分，每个类别取val_split比例作为验证集，两部分各自打乱
+    rng = np.random.default_rng(seed)
+    labels = np.array([label_id for _, label_id in samples])
+    train, val = [], []
+    for label_id in range(len(target_labels)):
+        idxs = rng.permutation(np.flatnonzero(labels == label_id))
+        n_val = int(round(len(idxs) * val_split))
+        val.append(idxs[:n_val])
+        train.append(idxs[n_val:])
+    train, val = np.concatenate(train), np.concatenate(val)
+    return rng.permutation(train), rng.permutation(val)
+
+def export(src, dst, val_split, seed):
+    samples = list_samples(src)
+    if len(samples) == 0: raise FileNotFoundError(f"{src}中没有图片")
+    train, val = split_samples(samples, val_split, seed)
+    order = np.concatenate([train, val])
+    dst.mkdir(parents=True, exist_ok=True)
+    # 逐张写入内存映射的数组，不需要把全部图片同时读入内存
+    images = np.lib.format.open_memmap(dst.joinpath("images.npy"), mode='w+', dtype=np.uint8, shape=(len(order), 28, 28))
+    labels = np.empty(len(order), dtype=np.uint8)
+    for i, idx in enumerate(order):
+        path, label_id = samples[idx]
+        img = Image.open(path).convert('L')
+        if img.size != (28, 28): img = img.resize((28, 28), Image.BILINEAR)
+        images[i] = np.array(img)
+        labels[i] = label_id
+    images.flush()
+    del images
+    np.save(dst.joinpath("labels.npy"), labels)
+    manifest = {
+        'version': 1,
+        'numSamples': len(order),
+        'imageShape': [28, 28],
+        'images': {'file': "images.npy", 'dtype': "uint8"},
+        'labels': {'file': "labels.npy", 'dtype': "uint8"},
+        'classes': list(target_labels),
+        'classCounts': np.bincount(labels, minlength=len(target_labels)).tolist(),
+        'split': {'seed': seed, 'valSplit': val_split, 'train': [0, len(train)], 'val': [len(train), len(order)]},
+    }
+    dst.joinpath("manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+def load_packed(path=PATH_PACKED):  # 返回(训练集图像, 训练集标签), (验证集图像, 验证集标签)，图像为内存映射的uint8数组
+    with open(path.joinpath("manifest.json"), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest['classes'] != list(target_labels):
+        raise ValueError(f"{path}中的类别与target_labels不一致，请重新执行packed.py")
+    images = np.load(path.joinpath(manifest['images']['file']), mmap_mode='r')
+    labels = np.load(path.joinpath(manifest['labels']['file']))
+    (a, b), (c, d) = manifest['split']['train'], manifest['split']['val']
+    return (images[a:b], labels[a:b]), (images[c:d], labels[c:d])
+
+def memmap_dataset(x, y, batch_size, shuffle=False, seed=42):
+    # 只把样本索引放入tf.data，每个batch按索引从内存映射的图像数组中读取，不会把整个数据集复制到内存中
+    # 训练集每个epoch重新打乱索引，batch内的索引排序后读取，使读取的位置尽量连续
+    ds = tf.data.Dataset.range(len(x))
+    if shuffle: ds = ds.shuffle(len(x), seed=seed, reshuffle_each_iteration=True)
+    def gather(idxs):
+        idxs = np.sort(idxs)
+        return x[idxs][..., None], y[idxs].astype(np.int32)
+    def load(idxs):
+        images, labels = tf.numpy_function(gather, [idxs], (tf.uint8, tf.int32))
+        images = tf.ensure_shape(images, (None, *x.shape[1:], 1))
+        return tf.cast(images, tf.float32), tf.ensure_shape(labels, (None,))
+    return ds.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE)
+
+def packed_datasets(batch_size, path=PATH_PACKED, seed=42):  # 与image_dataset_from_directory相同格式的(ds_train, ds_val)
+    # 图像为(batch, 28, 28, 1)的float32（0~255），标签为类别编号，训练集每个epoch重新打乱
+    (x_train, y_train), (x_val, y_val) = load_packed(path)
+    ds_train = memmap_dataset(x_train, y_train, batch_size, shuffle=True, seed=seed)
+    ds_val = memmap_dataset(x_val, y_val, batch_size)
+    return ds_train, ds_val
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--src', type=Path, default=PATH_DATASET, help="筛选后的数据集路径，每个类别一个文件夹")
+    parser.add_argument('--dst', type=Path, default=PATH_PACKED)
+    parser.add_argument('--val-split', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    manifest = export(args.src, args.dst, args.val_split, args.seed)
+    print(f"共{manifest['numSamples']}张图片，训练集{manifest['split']['train'][1]}张，"
+          f"验证集{manifest['split']['val'][1] - manifest['split']['val'][0]}张，保存到{args.dst}")
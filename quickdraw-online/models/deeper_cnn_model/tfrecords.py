@@ -0,0 +1,81 @@
+# 将packed.py打包的数据集写为分片的TFRecord文件，并提供读取的tf.data输入管道：
+# 多个分片并行读取(interleave) -> 按批解析(parallel map) -> 缓存在内存中(cache) -> 打乱(shuffle) -> 分批 -> 预取
+# 第一个epoch之后直接从内存缓存读取，不再访问磁盘和解析TFRecord
+# 用法: python tfrecords.py [--src dataset_packed路径] [--dst 输出路径] [--shards 16]
+import json
+import argparse
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from packed import load_packed
+from constant import target_labels, PATH_PACKED, PATH_TFRECORDS
+
+FEATURES = {
+    'image': tf.io.FixedLenFeature([], tf.string),  # 28x28的uint8图像的原始字节
+    'label': tf.io.FixedLenFeature([], tf.int64),
+}
+
+def to_example(img, label):
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[img.tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+    })).SerializeToString()
+
+def write_shards(images, labels, dst, split, n_shards):  # 将样本依次轮流写入n_shards个分片，返回分片文件名
+    files = [f"{split}-{i:05}-of-{n_shards:05}.tfrecord" for i in range(n_shards)]
+    writers = [tf.io.TFRecordWriter(str(dst.joinpath(file))) for file in files]
+    for i, (img, label) in enumerate(zip(images, labels)):
+        writers[i % n_shards].write(to_example(np.asarray(img), label))
+    for writer in writers: writer.close()
+    return files
+
+def export(src, dst, n_shards):
+    (x_train, y_train), (x_val, y_val) = load_packed(src)
+    dst.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        'version': 1,
+        'imageShape': [28, 28],
+        'classes': list(target_labels),
+        # 验证集较小，分片数减少为四分之一
+        'train': {'files': write_shards(x_train, y_train, dst, 'train', n_shards), 'count': len(x_train)},
+        'val': {'files': write_shards(x_val, y_val, dst, 'val', max(1, n_shards // 4)), 'count': len(x_val)},
+    }
+    dst.joinpath("manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+def parse_batch(serialized):  # 一次解析一批样本，比逐个样本解析快
+    features = tf.io.parse_example(serialized, FEATURES)
+    images = tf.reshape(tf.io.decode_raw(features['image'], tf.uint8), (-1, 28, 28, 1))
+    return images, tf.cast(features['label'], tf.int32)
+
+def read_split(path, files, batch_size, training, seed, shuffle_buffer):
+    ds = tf.data.Dataset.from_tensor_slices([str(path.joinpath(file)) for file in files])
+    ds = ds.interleave(tf.data.TFRecordDataset, cycle_length=min(len(files), 8),
+                       num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+    ds = ds.batch(1024).map(parse_batch, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    ds = ds.cache()  # 缓存解析后的uint8图像（约50MB），之后的epoch不再读取文件
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.map(lambda x, y: (tf.cast(x, tf.float32), y), num_parallel_calls=tf.data.AUTOTUNE)
+
+def tfrecord_datasets(batch_size, path=PATH_TFRECORDS, seed=42, shuffle_buffer=20000):
+    # 与image_dataset_from_directory相同格式的(ds_train, ds_val)：图像为(batch, 28, 28, 1)的float32（0~255），标签为类别编号
+    with open(path.joinpath("manifest.json"), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest['classes'] != list(target_labels):
+        raise ValueError(f"{path}中的类别与target_labels不一致，请重新执行tfrecords.py")
+    ds_train = read_split(path, manifest['train']['files'], batch_size, True, seed, shuffle_buffer)
+    ds_val = read_split(path, manifest['val']['files'], batch_size, False, seed, shuffle_buffer)
+    return ds_train, ds_val
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--src', type=Path, default=PATH_PACKED, help="packed.py打包后的数据集路径")
+    parser.add_argument('--dst', type=Path, default=PATH_TFRECORDS)
+    parser.add_argument('--shards', type=int, default=16, help="训练集的分片数")
+    args = parser.parse_args()
+
+    manifest = export(args.src, args.dst, args.shards)
+    print(f"训练集{manifest['train']['count']}张写入{len(manifest['train']['files'])}个分片，"
+          f"验证集{manifest['val']['count']}张写入{len(manifest['val']['files'])}个分片，保存到{args.dst}")
@@ -0,0 +1,74 @@
+# 训练吞吐量统计：每个epoch的图像/秒，以及输入管道与训练步骤各自的吞吐量，用于判断训练受限于输入(I/O、解码)还是计算
+# 单独执行时比较三种数据集读取方式的输入吞吐量: python throughput.py [--epochs 2]
+import time
+import argparse
+import tensorflow as tf
+
+keras = tf.keras
+
+class Throughput(keras.callbacks.Callback):  # 每个epoch结束时输出训练的图像吞吐量（按每个batch都是batch_size张图像估计）
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.images = 0
+        self.start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.images += self.batch_size
+
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.images / (time.perf_counter() - self.start)
+        print(f"epoch {epoch+1}: 训练吞吐量{rate:.1f}图像/秒")
+        if logs is not None: logs['images_per_sec'] = rate
+
+def measure_input(ds, epochs=2):  # 只遍历输入管道，返回每个epoch的图像/秒（第一个epoch包含读取文件和填充缓存的时间）
+    rates = []
+    for _ in range(epochs):
+        images, start = 0, time.perf_counter()
+        for x, _ in ds:
+            images += int(x.shape[0])
+        rates.append(images / (time.perf_counter() - start))
+    return rates
+
+def measure_compute(model, ds, steps=50):  # 用同一个batch反复训练模型的副本，返回不受输入影响的训练图像/秒
+    batch = next(iter(ds))
+    clone = keras.models.clone_model(model)  # 在副本上训练，不改变模型的权重
+    clone.compile(optimizer=keras.optimizers.Adam(), loss=model.loss)
+    const = tf.data.Dataset.from_tensors(batch).repeat()
+    clone.fit(const, steps_per_epoch=5, verbose=0)  # 预热：追踪和编译训练函数
+    start = time.perf_counter()
+    clone.fit(const, steps_per_epoch=steps, verbose=0)
+    return steps * int(batch[0].shape[0]) / (time.perf_counter() - start)
+
+def profile_pipeline(model, ds, steps=50):  # 比较输入管道和训练步骤的吞吐量，输入较慢时训练受限于输入
+    input_rates = measure_input(ds)
+    compute_rate = measure_compute(model, ds, steps)
+    bound = "输入(I/O、解码)" if input_rates[-1] < compute_rate else "计算"
+    print(f"输入管道: 第一个epoch {input_rates[0]:.1f}图像/秒，之后{input_rates[-1]:.1f}图像/秒；"
+          f"训练步骤: {compute_rate:.1f}图像/秒；训练速度受限于{bound}")
+    return input_rates, compute_rate
+
+if __name__ == '__main__':
+    from constant import target_labels, PATH_DATASET, PATH_PACKED, PATH_TFRECORDS
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=48)
+    args = parser.parse_args()
+
+    loaders = {}
+    if PATH_DATASET.exists():
+        loaders['image_dataset_from_directory'] = lambda: tf.keras.utils.image_dataset_from_directory(
+            directory=PATH_DATASET, class_names=target_labels, color_mode='grayscale', batch_size=args.batch,
+            validation_split=0.2, image_size=(28,28), subset='both', seed=42)
+    if PATH_PACKED.joinpath("manifest.json").exists():
+        from packed import packed_datasets
+        loaders['packed.py'] = lambda: packed_datasets(args.batch)
+    if PATH_TFRECORDS.joinpath("manifest.json").exists():
+        from tfrecords import tfrecord_datasets
+        loaders['tfrecords.py'] = lambda: tfrecord_datasets(args.batch)
+    for name, loader in loaders.items():
+        ds_train, _ = loader()
+        rates = measure_input(ds_train.prefetch(tf.data.AUTOTUNE), args.epochs)
+        print(f"{name:30}: " + "，".join(f"epoch {i+1} {rate:.1f}图像/秒" for i, rate in enumerate(rates)))